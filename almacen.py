@@ -0,0 +1,116 @@
+"""
+Almacén local (SQLite) de los movimientos procesados, para consultar claves, cuentas, fechas y tipos de movimiento
+sin volver a procesar los estados de cuenta.
+
+    guardar_movimientos(df)                       # resultado de asign_cve de un estado de cuenta; los ya guardados se actualizan
+    consultar_movimientos(clave="T0000123456")    # DataFrame con las columnas de config.COLS_EDO_CTA
+
+La tabla tiene índices sobre CLAVE, FECHA, CUENTA y TIPO MOVIMIENTO, de modo que las consultas por esos campos
+no recorren la tabla completa. Cada movimiento se identifica con una huella (hash de las columnas que vienen del
+estado de cuenta, COLS_HUELLA, y de cuántas veces se repiten los mismos valores en el DataFrame), así que volver a
+guardar el mismo estado de cuenta no duplica movimientos y dos movimientos idénticos del mismo estado de cuenta se
+guardan los dos. Por eso se guarda cada estado de cuenta por separado: en la unión de dos estados de cuenta que se
+traslapan, los movimientos en común se contarían como repeticiones y se guardarían dos veces. La huella no incluye las columnas que calculan las reglas (clave, tipo de movimiento, detalle,
+beneficiario): si cambian las reglas y se vuelve a guardar el estado de cuenta, esas columnas se actualizan.
+"""
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from config import COLS_EDO_CTA, RUTA_ALMACEN
+from utils import tipar_edo_cta
+
+# columna de la tabla para cada columna del resultado
+COLUMNAS_SQL = {col: col.lower().replace(" ", "_").replace("ó", "o").replace("Ó", "o") for col in COLS_EDO_CTA}
+TIPOS_SQL = {'FECHA': 'TEXT', 'CARGO': 'REAL', 'ABONO': 'REAL', 'SALDO': 'REAL'}
+# columnas que identifican el movimiento en el estado de cuenta; el resto las calculan las reglas de asign_cve
+COLS_HUELLA = ['BANCO', 'CUENTA', 'FECHA', 'DESCRIPCIÓN', 'CONCEPTO', 'REFERENCIA', 'REFERENCIA BANCARIA',
+               'CARGO', 'ABONO', 'SALDO']
+COLS_REGLAS = [col for col in COLS_EDO_CTA if col not in COLS_HUELLA]
+
+ESQUEMA = [
+    "CREATE TABLE IF NOT EXISTS movimientos (huella INTEGER NOT NULL UNIQUE, "
+    + ", ".join(f"{COLUMNAS_SQL[col]} {TIPOS_SQL.get(col, 'TEXT')}" for col in COLS_EDO_CTA) + ")",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_clave ON movimientos (clave)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos (fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_cuenta ON movimientos (banco, cuenta, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_movimientos_tipo ON movimientos (tipo_movimiento)",
+]
+
+def conectar(ruta: str = RUTA_ALMACEN) -> sqlite3.Connection:
+    """Abre el almacén (lo crea si no existe) con el esquema e índices."""
+    con = sqlite3.connect(ruta)
+    # WAL permite consultar mientras otro proceso guarda
+    con.execute("PRAGMA journal_mode=WAL")
+    for sentencia in ESQUEMA:
+        con.execute(sentencia)
+    return con
+
+def huellas_resultado(df: pd.DataFrame) -> np.ndarray:
+    """
+    Huella (int64) de cada movimiento del resultado a partir de COLS_HUELLA; los movimientos con los mismos valores
+    se distinguen por su número de repetición.
+    """
+    filas = pd.util.hash_pandas_object(df[COLS_HUELLA], index=False)
+    repeticion = filas.groupby(filas.to_numpy()).cumcount()
+    huellas = pd.util.hash_pandas_object(pd.DataFrame({"fila": filas.to_numpy(), "repeticion": repeticion.to_numpy()}), index=False)
+    # SQLite guarda enteros con signo de 64 bits
+    return huellas.to_numpy().view(np.int64)
+
+def guardar_movimientos(df: pd.DataFrame, ruta: str = RUTA_ALMACEN) -> int:
+    """
+    Agrega al almacén los movimientos del resultado de asign_cve de un estado de cuenta que no estaban y actualiza
+    las columnas de las reglas (COLS_REGLAS) de los que ya estaban; regresa cuántos se agregaron.
+    """
+    if df is None or df.empty:
+        return 0
+    columnas = {col: df[col].astype(object).where(df[col].notna(), None) for col in COLS_EDO_CTA}
+    columnas['FECHA'] = df['FECHA'].dt.strftime('%Y-%m-%d %H:%M:%S').astype(object).where(df['FECHA'].notna(), None)
+    filas = zip(huellas_resultado(df).tolist(), *(columnas[col].tolist() for col in COLS_EDO_CTA))
+    marcadores = ", ".join("?" * (len(COLS_EDO_CTA) + 1))
+    actualizar = ", ".join(f"{COLUMNAS_SQL[col]} = excluded.{COLUMNAS_SQL[col]}" for col in COLS_REGLAS)
+    with closing(conectar(ruta)) as con, con:
+        # total_changes también cuenta las filas actualizadas, así que los nuevos se cuentan con COUNT(*)
+        antes = con.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0]
+        con.executemany(f"INSERT INTO movimientos (huella, {', '.join(COLUMNAS_SQL.values())}) VALUES ({marcadores}) "
+                        f"ON CONFLICT (huella) DO UPDATE SET {actualizar}", filas)
+        return con.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0] - antes
+
+def consultar_movimientos(clave: str = None, banco: str = None, cuenta: str = None, tipo: str = None,
+                          fecha_inicio=None, fecha_fin=None, limite: int = 10000, ruta: str = RUTA_ALMACEN,
+                          columnas: list = None) -> pd.DataFrame:
+    """
+    Movimientos que cumplen todos los filtros dados, ordenados por fecha. `clave` es la clave exacta;
+    `fecha_inicio` y `fecha_fin` (fechas o textos "AAAA-MM-DD") son inclusivos. Regresa como máximo `limite` filas
+    con las `columnas` indicadas (por defecto, todas las de config.COLS_EDO_CTA).
+    """
+    columnas = columnas or COLS_EDO_CTA
+    condiciones, parametros = [], []
+    for col, valor in [('CLAVE', clave), ('BANCO', banco), ('CUENTA', cuenta), ('TIPO MOVIMIENTO', tipo)]:
+        if valor is not None:
+            condiciones.append(f"{COLUMNAS_SQL[col]} = ?")
+            parametros.append(str(valor))
+    if fecha_inicio is not None:
+        condiciones.append("fecha >= ?")
+        parametros.append(pd.Timestamp(fecha_inicio).strftime('%Y-%m-%d'))
+    if fecha_fin is not None:
+        # hasta el final del día
+        condiciones.append("fecha < ?")
+        parametros.append((pd.Timestamp(fecha_fin) + pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
+    consulta = f"SELECT {', '.join(COLUMNAS_SQL[col] for col in columnas)} FROM movimientos"
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    consulta += " ORDER BY fecha LIMIT ?"
+    with closing(conectar(ruta)) as con:
+        df = pd.read_sql_query(consulta, con, params=parametros + [limite])
+    df.columns = columnas
+    if 'FECHA' in df.columns:
+        df['FECHA'] = pd.to_datetime(df['FECHA'], format='%Y-%m-%d %H:%M:%S')
+    return tipar_edo_cta(df)
+
+def resumen_almacen(ruta: str = RUTA_ALMACEN) -> pd.DataFrame:
+    """Número de movimientos y rango de fechas guardados por banco y cuenta."""
+    with closing(conectar(ruta)) as con:
+        return pd.read_sql_query(
+            "SELECT banco AS BANCO, cuenta AS CUENTA, COUNT(*) AS MOVIMIENTOS, MIN(fecha) AS DESDE, MAX(fecha) AS HASTA "
+            "FROM movimientos GROUP BY banco, cuenta ORDER BY banco, cuenta", con)
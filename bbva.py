@@ -1,21 +1,59 @@
+import csv
 import pandas as pd
 import numpy as np
 import re
-from utils import txt_to_df
+from utils import asignar_pendientes, avisar, campos_huella, tipar_edo_cta
+from config import ENCODING_BANCO
+from extractor import ExtractorClaves, PATRON_PAGO, PATRON_TRASPASO, PATRON_NOMINA
+
+# columnas de importes del txt de BBVA (los nombres vienen así en el archivo)
+COLS_IMPORTE_BBVA = ["cargo", "Abono", "Saldo"]
+
+def encoding_bbva(encabezado:bytes)->str:
+    """Codificación del txt según su línea de encabezado: UTF-8 si "Día" viene en UTF-8, si no la de config.ENCODING_BANCO."""
+    return "utf-8" if "Día".encode("utf-8") in encabezado else ENCODING_BANCO["BBVA"]
+
+def leer_txt_bbva(uploaded_file)->pd.DataFrame:
+    """
+    Lee el txt separado por tabuladores con pd.read_csv (sin comillas ni valores nulos por defecto: los textos quedan tal cual).
+    Los importes se leen directamente como números con "," de miles; si alguno no se puede interpretar
+    (p. ej. con espacios o apóstrofos) se leen como texto y se limpian antes de convertirlos.
+    """
+    inicio = uploaded_file.tell()
+    encoding = encoding_bbva(uploaded_file.readline())
+    opciones = dict(sep="\t", quoting=csv.QUOTE_NONE, keep_default_na=False, dtype=str)
+
+    def leer(encoding, **kwargs):
+        uploaded_file.seek(inicio)
+        return pd.read_csv(uploaded_file, encoding=encoding, **{**opciones, **kwargs})
+
+    def leer_con_encoding(**kwargs):
+        try:
+            return leer(encoding, **kwargs)
+        except UnicodeDecodeError:
+            # el encabezado parecía UTF-8 pero el resto del archivo no lo es
+            return leer(ENCODING_BANCO["BBVA"], **kwargs)
+
+    try:
+        df = leer_con_encoding(dtype={col: "float64" for col in COLS_IMPORTE_BBVA}, thousands=",",
+                               na_values={col: [""] for col in COLS_IMPORTE_BBVA})
+    except ValueError:
+        df = leer_con_encoding()
+        for col in COLS_IMPORTE_BBVA:
+            df[col] = pd.to_numeric(df[col].str.replace(",", "").str.replace(" ", "").str.replace("'", ""), errors="coerce")
+    for col in COLS_IMPORTE_BBVA:
+        df[col] = df[col].fillna(0)
+    return df
 
 def preprocess_bbva(uploaded_file)->pd.DataFrame:
-    # para BBVA, se recibe como .txt
-    df = txt_to_df(uploaded_file, default_encoding="latin-1")
-    # convertimos las columnas "Cargo", "abono", "Saldo" a tipo numérico rellenando los nulos con 0
-    for col in ["cargo", "Abono", "Saldo"]:
-        df[col] = pd.to_numeric(df[col].str.replace(",", "").str.replace(" ", "").str.replace("'", ""), errors="coerce").fillna(0)
+    # para BBVA, se recibe como .txt; los importes ya vienen numéricos con los nulos en 0
+    df = leer_txt_bbva(uploaded_file)
     # Corregir encabezados si están mal codificados
     df.columns = [col.replace("DÃ­a", "Día") for col in df.columns]
     try:
         df['Día'] = df['Día'].astype(str)
     except Exception as e:
-        print(f"Error converting 'Día' to string: {e}")
-    # print(df['Día'][0])
+        avisar(f"No se pudo convertir 'Día' a texto: {e}")
     # "Concepto / Referencia" a string sin el espacio inicial
     df["Concepto / Referencia"] = df["Concepto / Referencia"].astype(str).str.lstrip()
 
@@ -86,7 +124,51 @@ def asign_cve_bbva(row):
             cve = fecha
             
     return cve
-    
+
+# reglas de clave de BBVA sobre la referencia, en orden de prioridad
+EXTRACTOR_BBVA = ExtractorClaves([
+    ("pago", PATRON_PAGO),
+    ("traspaso", PATRON_TRASPASO),
+    ("nomina", PATRON_NOMINA, "NOM "),
+    ("guia", r"GUIA:(\d{7})"),
+    ("diez_digitos", r"(\d{10}) "),
+])
+
+def asign_cve_bbva_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_bbva`: resuelve la cascada de reglas con `EXTRACTOR_BBVA`, que evalúa regla por regla sobre las referencias distintas que siguen sin clave."""
+    # la referencia es la cadena de texto que aparece después de "/"
+    ref = edo_cta["Concepto / Referencia"].str.extract(r"/(.+)", expand=False).fillna("")
+    # fecha en formato DDMMYYYY, dado que viene como "DD-MM-YYYY"
+    fecha = edo_cta["Día"].astype(str).str.split("-")
+    fecha = fecha.str[0] + fecha.str[1] + fecha.str[2]
+    extraido = EXTRACTOR_BBVA.extraer(ref)
+    cve = extraido["clave"].copy()
+    # si "NOM " está en la referencia y no hubo clave de pago o traspaso, la clave es la de nómina o NaN
+    nomina = ~extraido["regla"].isin(["pago", "traspaso"]) & ref.str.contains("NOM ", regex=False)
+    cve[nomina & (extraido["regla"] != "nomina")] = np.nan
+    pendientes = extraido["regla"].isna() & ~nomina
+    # "NOTPROVIDED": día de la fecha más el importe sin separadores
+    no_provided = pendientes & (ref == "NOTPROVIDED")
+    cargo = edo_cta.loc[no_provided, "cargo"]
+    importe = cargo.where(cargo.astype(float) > 0, edo_cta.loc[no_provided, "Abono"]).astype(str)
+    importe = importe.str.replace(",", "", regex=False).str.replace(".", "", regex=False).str.replace(" ", "", regex=False).str.strip()
+    pendientes = asignar_pendientes(cve, pendientes, fecha[no_provided].str[:2] + importe)
+    # con referencia: "IVA_" o "COM_" más la fecha; sin referencia: la fecha
+    con_ref = ref.str.strip() != ""
+    valores = pd.Series(np.where(ref.str.contains("IVA COM", regex=False), "IVA_", "COM_"), index=ref.index) + fecha
+    valores = valores.where(con_ref, fecha)[pendientes]
+    asignar_pendientes(cve, pendientes, valores, resueltas=valores.index)
+    return cve
+
+def fechas_bbva(fechas:pd.Series)->pd.Series:
+    """Convierte las fechas del txt ("dd-mm-aaaa") a datetime."""
+    return pd.to_datetime(fechas, format="%d-%m-%Y", errors="raise")
+
+def huella_bbva(df:pd.DataFrame)->pd.DataFrame:
+    """Campos que identifican cada movimiento leído en el procesamiento incremental (ver `utils.campos_huella`)."""
+    return campos_huella(fechas_bbva(df["Día"]), df["Abono"] - df["cargo"], df["Saldo"],
+                         df.drop(columns=["Día", "cargo", "Abono", "Saldo"]))
+
 def format_bbva(edo_cta:pd.DataFrame, cta: str)->pd.DataFrame:
     # formateamos el DataFrame para que tenga las columnas necesarias
     # y renombramos las columnas
@@ -101,7 +183,7 @@ def format_bbva(edo_cta:pd.DataFrame, cta: str)->pd.DataFrame:
     edo_cta["ABONO"] = edo_cta["ABONO"].fillna(0)
     edo_cta["CARGO"] = edo_cta["CARGO"].fillna(0)
     # convertimos la columna "Fecha" a tipo datetime
-    edo_cta["FECHA"] = pd.to_datetime(edo_cta["FECHA"], format="%d-%m-%Y", errors="raise")
+    edo_cta["FECHA"] = fechas_bbva(edo_cta["FECHA"])
     # el concepto es lo que aparece en "Concepto / Referencia" antes de "/"
     # y referencia es lo que aparece después de "/"
     edo_cta["CONCEPTO"] = edo_cta["Concepto / Referencia"].str.split("/").str[0]
@@ -116,4 +198,5 @@ def format_bbva(edo_cta:pd.DataFrame, cta: str)->pd.DataFrame:
 
     edo_cta["CUENTA"] = cta
 
-    return edo_cta
\ No newline at end of file
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
\ No newline at end of file
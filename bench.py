@@ -0,0 +1,250 @@
+"""
+Mide el tiempo de cada etapa de `cves.asign_cve` con estados de cuenta sintéticos (sinteticos.py) de cada banco.
+
+    python bench.py [--filas 20000] [--bancos Banamex HSBC] [--repeticiones 3] [--salida bench.json]
+
+Etapas: lectura (preprocess), claves, consolidación, formato, limpieza (postprocesar sin tipo de movimiento),
+tipo de movimiento y exportación a Excel. De cada etapa se reporta la mediana de las repeticiones en segundos,
+y de la asignación de claves la tasa de aciertos de la memoria del extractor (filas cuya clave no se evaluó).
+El resultado se escribe como JSON con el commit y las versiones para poder comparar entre commits.
+
+    python bench.py --verificar [--referencia otra.json]
+
+Con --verificar no se mide: para cada banco se compara la salida vectorizada contra la de las funciones
+fila por fila (vectorizado=False), columna por columna, y la huella de cada columna contra la de la referencia.
+La referencia por defecto (referencia_bench.json) se generó con el código original, antes de las optimizaciones,
+sobre los mismos archivos sintéticos, así que también detecta cambios en el código común a las dos rutas
+(lectura, formato, tipos). Con --referencia se usa otro archivo; si no existe, se crea con la salida actual
+para comparar después entre commits.
+
+    python bench.py --lectores-hsbc [--filas 100000] [--repeticiones 3]
+
+Con --lectores-hsbc se mide la lectura del xlsx de HSBC con cada lector disponible (hsbc.MOTORES_EXCEL_HSBC)
+y se verifica que todos regresen el mismo DataFrame que openpyxl (termina con 1 si alguno difiere).
+"""
+import io
+import os
+import hashlib
+import sys
+import json
+import time
+import warnings
+import platform
+import argparse
+import statistics
+import subprocess
+import pandas as pd
+import numpy as np
+import importlib
+import cves
+from config import COLS_EDO_CTA, MODULOS_BANCO
+from extractor import ExtractorClaves
+from utils import AvisoEdoCta, tipar_edo_cta
+from export import export_to_excel
+from sinteticos import GENERADORES, generar
+
+# huellas por columna de la salida del código original para los archivos sintéticos (ver `verificar`)
+REFERENCIA_BENCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "referencia_bench.json")
+FILAS_BENCH = 20000
+
+ETAPAS = ["lectura", "claves", "consolidacion", "formato", "limpieza", "tipo_movimiento", "exportacion"]
+
+def medir_etapas(contenido: bytes, bank: str, cta: str, vectorizado: bool = True) -> dict:
+    """Procesa el archivo igual que `cves.asign_cve` (sin bloques) y regresa los segundos de cada etapa y el número de filas."""
+    banco = cves.cargar_banco(bank)
+    tiempos = {}
+    t = time.perf_counter()
+    edo_cta = banco["preprocess"](io.BytesIO(contenido))
+    tiempos["lectura"] = time.perf_counter() - t
+    t = time.perf_counter()
+    edo_cta["cve"] = cves.asignar_claves(edo_cta, banco["asign_fila"], banco["asign_vec"], vectorizado)
+    tiempos["claves"] = time.perf_counter() - t
+    t = time.perf_counter()
+    if banco["consolidar"] is not None:
+        edo_cta = banco["consolidar"](edo_cta)
+    tiempos["consolidacion"] = time.perf_counter() - t
+    t = time.perf_counter()
+    edo_cta = banco["format"](edo_cta, cta)
+    tiempos["formato"] = time.perf_counter() - t
+    t = time.perf_counter()
+    edo_cta = cves.limpiar_columnas(edo_cta)
+    tiempos["limpieza"] = time.perf_counter() - t
+    t = time.perf_counter()
+    edo_cta["TIPO MOVIMIENTO"] = cves.asignar_tipo(edo_cta, vectorizado)
+    edo_cta = tipar_edo_cta(edo_cta[COLS_EDO_CTA])
+    tiempos["tipo_movimiento"] = time.perf_counter() - t
+    t = time.perf_counter()
+    export_to_excel(edo_cta, io.BytesIO(), bank, cta)
+    tiempos["exportacion"] = time.perf_counter() - t
+    return {"filas": len(edo_cta), "segundos": tiempos}
+
+def extractor_banco(bank: str) -> ExtractorClaves:
+    """El extractor de reglas de clave del módulo del banco (None si no usa uno)."""
+    modulo = importlib.import_module(MODULOS_BANCO[bank])
+    return next((valor for valor in vars(modulo).values() if isinstance(valor, ExtractorClaves)), None)
+
+def huellas_columnas(df: pd.DataFrame) -> dict:
+    """
+    Hash de cada columna del resultado para compararlo entre commits, sin depender de los tipos (config.TIPOS_EDO_CTA):
+    los importes como flotantes (lo que no es número, como el SALDO "#" de PNC, cuenta como nulo), la fecha como
+    datetime y el resto como texto, con los nulos como "nan".
+    """
+    huellas = {}
+    for col in df.columns:
+        if col in ("CARGO", "ABONO", "SALDO"):
+            valores = pd.to_numeric(df[col].astype(object), errors="coerce").astype(float)
+        elif col == "FECHA":
+            valores = pd.to_datetime(df[col]).astype("datetime64[ns]")
+        else:
+            valores = df[col].astype(object).where(df[col].notna(), "nan").astype(str)
+        h = hashlib.sha256(pd.util.hash_pandas_object(valores, index=False).to_numpy().tobytes())
+        huellas[col] = h.hexdigest()[:16]
+    return huellas
+
+def leer_referencia(referencia: str) -> dict:
+    """Contenido del JSON de referencia ({"filas", "semilla", "bancos": {banco: {"filas", "columnas"}}}) o None si no existe."""
+    if not os.path.exists(referencia):
+        return None
+    with open(referencia, encoding="utf-8") as f:
+        return json.load(f)
+
+def verificar(bancos: list, filas: int, semilla: int, referencia: str = REFERENCIA_BENCH) -> bool:
+    """
+    Compara la salida vectorizada contra la fila por fila y contra las huellas por columna de `referencia`;
+    imprime las diferencias. La referencia solo aplica con las mismas filas y semilla con las que se generó;
+    si el archivo no existe, se escribe con la salida actual.
+    """
+    guardada = leer_referencia(referencia)
+    if guardada is not None and (guardada["filas"], guardada["semilla"]) != (filas, semilla):
+        print(f"La referencia {referencia} es de {guardada['filas']} filas y semilla {guardada['semilla']}; no se compara contra ella")
+        guardada = {"bancos": {}}
+    bancos_guardados = guardada["bancos"] if guardada is not None else {}
+    resultado, correcto = {}, True
+    for bank in bancos:
+        contenido = generar(bank, filas, semilla)
+        cta = GENERADORES[bank][1]
+        vectorizado = cves.asign_cve(io.BytesIO(contenido), bank, cta)
+        por_fila = cves.asign_cve(io.BytesIO(contenido), bank, cta, vectorizado=False)
+        diferentes = [col for col in vectorizado.columns
+                      if not vectorizado[col].astype(str).equals(por_fila[col].astype(str))]
+        if vectorizado.shape != por_fila.shape:
+            diferentes.insert(0, f"forma {vectorizado.shape} vs {por_fila.shape}")
+        resultado[bank] = {"filas": len(vectorizado), "columnas": huellas_columnas(vectorizado)}
+        esperado = bancos_guardados.get(bank)
+        if esperado is not None:
+            if esperado["filas"] != len(vectorizado):
+                diferentes.append(f"{len(vectorizado)} filas vs {esperado['filas']} en la referencia")
+            else:
+                diferentes += [f"{col} vs referencia" for col, h in esperado["columnas"].items()
+                               if resultado[bank]["columnas"].get(col) != h]
+        correcto = correcto and not diferentes
+        print(f"{bank:<10} {len(vectorizado):>8} filas  {'OK' if not diferentes else 'DIFERENTE: ' + ', '.join(diferentes)}")
+    if guardada is None:
+        with open(referencia, "w", encoding="utf-8") as f:
+            json.dump({"commit": commit_actual(), "filas": filas, "semilla": semilla, "bancos": resultado}, f, indent=2)
+        print(f"Referencia escrita: {referencia}")
+    return correcto
+
+def comparar_lectores_hsbc(filas: int, repeticiones: int, semilla: int) -> tuple:
+    """
+    Mediana en segundos de `hsbc.preprocess_hsbc` con cada lector instalado (None en los que no están disponibles)
+    y si todos regresan el mismo DataFrame que openpyxl, el lector original.
+    """
+    import hsbc
+    contenido = generar("HSBC", filas, semilla)
+    referencia = hsbc.preprocess_hsbc(io.BytesIO(contenido), "openpyxl")
+    resultado, iguales = {}, True
+    for motor in hsbc.MOTORES_EXCEL_HSBC:
+        try:
+            df = hsbc.preprocess_hsbc(io.BytesIO(contenido), motor)
+        except ImportError as e:
+            print(f"{motor:<16} no disponible ({e})")
+            resultado[motor] = None
+            continue
+        tiempos = []
+        for _ in range(repeticiones):
+            t = time.perf_counter()
+            hsbc.preprocess_hsbc(io.BytesIO(contenido), motor)
+            tiempos.append(time.perf_counter() - t)
+        resultado[motor] = statistics.median(tiempos)
+        igual = df.equals(referencia) and df.dtypes.equals(referencia.dtypes)
+        iguales &= igual
+        print(f"{motor:<16} {resultado[motor]:>8.2f} s  {len(df)} filas  {'mismo DataFrame' if igual else 'DIFERENTE'}")
+    return resultado, iguales
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de cada etapa con estados de cuenta sintéticos.")
+    parser.add_argument("--filas", type=int, help=f"movimientos por archivo sintético (por defecto {FILAS_BENCH}; "
+                                                   "con --verificar, las de la referencia)")
+    parser.add_argument("--bancos", nargs="+", choices=list(GENERADORES.keys()), default=list(GENERADORES.keys()))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--por-fila", action="store_true", help="asignar claves y tipo fila por fila (vectorizado=False)")
+    parser.add_argument("--salida", help="archivo JSON de resultados (por defecto solo se imprime)")
+    parser.add_argument("--verificar", action="store_true", help="comparar la salida vectorizada contra la fila por fila en lugar de medir")
+    parser.add_argument("--lectores-hsbc", action="store_true", help="comparar los lectores del xlsx de HSBC en lugar de medir las etapas")
+    parser.add_argument("--referencia", default=REFERENCIA_BENCH,
+                        help="JSON con las huellas de salida por banco para --verificar (se crea si no existe)")
+    args = parser.parse_args(argv)
+    # los avisos de los datos sintéticos no interesan aquí
+    warnings.simplefilter("ignore", AvisoEdoCta)
+    if args.verificar:
+        referencia = leer_referencia(args.referencia)
+        filas = args.filas or (referencia["filas"] if referencia is not None else FILAS_BENCH)
+        return 0 if verificar(args.bancos, filas, args.semilla, args.referencia) else 1
+    args.filas = args.filas or FILAS_BENCH
+    if args.lectores_hsbc:
+        tiempos, iguales = comparar_lectores_hsbc(args.filas, args.repeticiones, args.semilla)
+        if args.salida:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump({"commit": commit_actual(), "filas": args.filas, "lectores_hsbc": tiempos}, f, indent=2)
+        return 0 if iguales else 1
+
+    resultado = {
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "filas": args.filas,
+        "repeticiones": args.repeticiones,
+        "vectorizado": not args.por_fila,
+        "bancos": {},
+    }
+    print(f"{'banco':<10} {'filas':>8} " + " ".join(f"{etapa[:12]:>12}" for etapa in ETAPAS) + f" {'total':>8} {'filas/s':>10} {'memo':>6}")
+    for bank in args.bancos:
+        contenido = generar(bank, args.filas, args.semilla)
+        cta = GENERADORES[bank][1]
+        # primera corrida sin medir: importa el módulo del banco y compila las expresiones regulares
+        medir_etapas(contenido, bank, cta, not args.por_fila)
+        # la memoria del extractor sigue llena de la primera corrida: se vacía antes de cada corrida medida
+        # para no medir solo aciertos; la tasa que se reporta es la de un archivo procesado desde cero
+        extractor = extractor_banco(bank)
+        corridas = []
+        for _ in range(args.repeticiones):
+            if extractor is not None:
+                extractor.memo.clear()
+                extractor.reiniciar_estadisticas()
+            corridas.append(medir_etapas(contenido, bank, cta, not args.por_fila))
+        tasa = extractor.tasa_aciertos() if extractor is not None else None
+        segundos = {etapa: statistics.median(c["segundos"][etapa] for c in corridas) for etapa in ETAPAS}
+        total = sum(segundos.values())
+        filas = corridas[0]["filas"]
+        resultado["bancos"][bank] = {"bytes": len(contenido), "filas": filas, "segundos": segundos, "total": total,
+                                   "aciertos_memo_claves": tasa}
+        print(f"{bank:<10} {filas:>8} " + " ".join(f"{segundos[etapa]:>12.3f}" for etapa in ETAPAS)
+              + f" {total:>8.2f} {filas / total if total else 0:>10,.0f} {'' if tasa is None else f'{tasa:.0%}':>6}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"Escrito: {args.salida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
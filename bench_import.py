@@ -0,0 +1,41 @@
+"""
+Mide el tiempo de importación de los módulos de la herramienta en un intérprete nuevo,
+que es lo que paga cada proceso del pool o cada ejecución de la CLI antes de procesar un archivo.
+
+    python bench_import.py [repeticiones]
+
+Para cada caso se reporta la mediana en segundos y si Streamlit quedó importado.
+"""
+import sys
+import json
+import statistics
+import subprocess
+
+CASOS = {
+    "pandas (piso)": "import pandas",
+    "cves": "import cves",
+    "cves + un banco": "import cves; cves.cargar_banco('Banamex')",
+    "cves + todos los bancos": "import cves, config; [cves.cargar_banco(b) for b in config.MODULOS_BANCO]",
+    "paralelo (workers)": "import paralelo",
+    "cli": "import cli",
+    # lo que costaba importar cves cuando bnx importaba streamlit al inicio del módulo
+    "cves + streamlit (antes)": "import streamlit, cves",
+}
+
+def medir(codigo: str, repeticiones: int) -> tuple:
+    """Ejecuta `codigo` en un intérprete nuevo `repeticiones` veces; regresa la mediana en segundos y si se importó Streamlit."""
+    script = ("import time; _t = time.perf_counter(); " + codigo + "; _s = time.perf_counter() - _t; "
+              "import sys, json; print(json.dumps([_s, 'streamlit' in sys.modules]))")
+    tiempos, con_streamlit = [], False
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        segundos, con_streamlit = json.loads(salida.strip().splitlines()[-1])
+        tiempos.append(segundos)
+    return statistics.median(tiempos), con_streamlit
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'caso':<28} {'mediana (s)':>12}  streamlit")
+    for nombre, codigo in CASOS.items():
+        segundos, con_streamlit = medir(codigo, repeticiones)
+        print(f"{nombre:<28} {segundos:>12.3f}  {'sí' if con_streamlit else 'no'}")
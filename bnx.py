@@ -1,39 +1,69 @@
 import pandas as pd
 import numpy as np
 import re
-import streamlit as st
+from config import ENCODING_BANCO
+from utils import ErrorEdoCta, campos_huella, tipar_edo_cta
+from extractor import ExtractorClaves, PATRON_PAGO, PATRON_TRASPASO, PATRON_NOMINA
 
-def preprocess_bnx(uploaded_file)->pd.DataFrame:
-    # # para Banamex, se recibe como .csv    
-    # primero leemos el archivo csv y guardamos todas las filas
-    content = uploaded_file.read()               # bytes
-    encoding = "latin-1" # por defecto, pero se puede detectar con chardet si es necesario
-    text = content.decode(encoding)              # str
-    lines = text.splitlines()                    # lista de líneas
-
-    # buscamos la fila que contiene "Detalle de Movimientos - Depósitos y Retiros"
-    header_row = next((i for i, line in enumerate(lines) if "Detalle de Movimientos - Depósitos y Retiros" in line), None)
-    if header_row is None:
-        st.error("No se encontró la fila de encabezado en el archivo. Asegúrate de que el formato del archivo sea correcto.")
-        return pd.DataFrame(columns=["Fecha", "Descripción", "Depósitos", "Retiros", "Saldo"])
-    header_row += 1
-    data = lines[header_row:]
-    # creamos un DataFrame a partir de las líneas del archivo csv
-    from io import StringIO
-    data_str = "\n".join(data)
-    df = pd.read_csv(StringIO(data_str), sep=",", encoding=encoding)
-    print(df.columns)
+# encabezado que precede a la tabla de movimientos en el csv de Banamex
+ENCABEZADO_BNX = "Detalle de Movimientos - Depósitos y Retiros"
+ERROR_ENCABEZADO_BNX = "No se encontró la fila de encabezado en el archivo. Asegúrate de que el formato del archivo sea correcto."
+
+def limpiar_bnx(df:pd.DataFrame)->pd.DataFrame:
     # Depósitos, Retiros y Saldo son columnas que contienen valores numéricos
     # convertimos las columnas "Depósitos" y "Retiros" a tipo numérico rellenando los nulos con 0
     df["Depósitos"] = pd.to_numeric(df["Depósitos"].astype(str).str.replace(",", "").str.replace(" ", ""), errors="coerce").fillna(0)
     df["Retiros"] = pd.to_numeric(df["Retiros"].astype(str).str.replace(",", "").str.replace(" ", ""), errors="coerce").fillna(0)
-    df["Saldo"] = pd.to_numeric(df["Saldo"].astype(str).str.replace(",", "").str.replace(" ", ""), errors="coerce").fillna(0)
+    # el saldo vacío queda nulo (no 0) para que la validación no lo tome como un saldo real
+    df["Saldo"] = pd.to_numeric(df["Saldo"].astype(str).str.replace(",", "").str.replace(" ", ""), errors="coerce")
 
     # Descripción a string
     df["Descripción"] = df["Descripción"].astype(str)
 
     return df
 
+def posicionar_tabla_bnx(uploaded_file, tamano_bloque:int=64 * 1024)->int:
+    """
+    Busca el encabezado de movimientos en los bytes del archivo, leyendo por bloques sin decodificar el preámbulo,
+    y deja el archivo posicionado al inicio de la línea siguiente (la de los nombres de columna); regresa esa posición.
+    """
+    marca = ENCABEZADO_BNX.encode(ENCODING_BANCO["Banamex"])
+    inicio_bloque = uploaded_file.tell()
+    anterior = b""
+    while True:
+        bloque = uploaded_file.read(tamano_bloque)
+        if not bloque:
+            raise ErrorEdoCta(ERROR_ENCABEZADO_BNX)
+        # se busca junto con el final del bloque anterior por si la marca quedó partida entre los dos
+        texto = anterior + bloque
+        pos = texto.find(marca)
+        if pos >= 0:
+            break
+        anterior = texto[-(len(marca) - 1):]
+        inicio_bloque += len(texto) - len(anterior)
+    # saltamos el resto de la línea del encabezado
+    uploaded_file.seek(inicio_bloque + pos + len(marca))
+    uploaded_file.readline()
+    return uploaded_file.tell()
+
+def preprocess_bnx(uploaded_file)->pd.DataFrame:
+    # para Banamex, se recibe como .csv con un preámbulo antes de la tabla de movimientos;
+    # pd.read_csv lee directamente del archivo a partir de la línea de nombres de columna, sin copiar el contenido
+    posicionar_tabla_bnx(uploaded_file)
+    df = pd.read_csv(uploaded_file, sep=",", encoding=ENCODING_BANCO["Banamex"])
+
+    return limpiar_bnx(df)
+
+def iter_bnx(uploaded_file, chunksize:int):
+    """
+    Lee el csv de Banamex en bloques de `chunksize` filas sin cargar el archivo completo en memoria.
+    Se posiciona después del encabezado de movimientos (`posicionar_tabla_bnx`) y a partir de ahí
+    lo lee con `pd.read_csv(chunksize=...)`; cada bloque sale ya preprocesado como en `preprocess_bnx`.
+    """
+    posicionar_tabla_bnx(uploaded_file)
+    for df in pd.read_csv(uploaded_file, sep=",", encoding=ENCODING_BANCO["Banamex"], chunksize=chunksize):
+        yield limpiar_bnx(df)
+
 
 def asign_cve_bnx(row):
     descripcion = row["Descripción"]
@@ -144,7 +174,64 @@ def asign_cve_bnx(row):
     else:
         # si no encontramos una coincidencia, devolvemos NaN
         return np.nan
-    
+
+# cascada de reglas de clave de Banamex sobre la descripción, en orden de prioridad
+EXTRACTOR_BNX = ExtractorClaves([
+    ("pago", PATRON_PAGO),
+    ("traspaso", PATRON_TRASPASO),
+    # solo para abonos (se deshabilita en cargos)
+    ("autorizacion_abono", r"Autorización:\s*(\d+)"),
+    ("nomina", PATRON_NOMINA, "NOM "),
+    ("pago_terceros", r"PAGO TERCEROS\s+NO\.AU\s+(Y)(\d{10})\s+(\d{6})"),
+    ("nominas_vig", r"Nominas Vig (88MIN[A-Za-z0-9]{15})"),
+    # se evalúa sobre la descripción en mayúsculas, como en asign_cve_bnx
+    ("pago_a_terceros", r"PAGO A TERCEROS\s+([A-Z0-9]+)[\s$]", None, str.upper),
+    ("referencia_unica", r"^(?=[A-Z0-9]*\d)([A-Z0-9]+)\s+Referencia Númerica:"),
+    ("ly", r"(LY\d{6}_\d+)"),
+    ("facts", r"PAGOS FACTS MULTILOG"),
+    ("autorizacion", r"Autorización:\s*(\d+)"),
+])
+
+def asign_cve_bnx_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_bnx`: resuelve la cascada de reglas con `EXTRACTOR_BNX`, que evalúa regla por regla sobre las descripciones distintas que siguen sin clave."""
+    descripcion = edo_cta["Descripción"].astype(str)
+    extraido = EXTRACTOR_BNX.extraer(descripcion, deshabilitadas={"autorizacion_abono": ~(edo_cta["Depósitos"] > 0)})
+    cve = extraido["clave"].copy()
+    regla = extraido["regla"]
+    # "PAGOS FACTS MULTILOG": fecha e importe separados por guion bajo (NaN si la fecha no se puede procesar)
+    facts = regla == "facts"
+    if facts.any():
+        fecha = edo_cta.loc[facts, "Fecha"].astype(str)
+        partes = fecha.str.split("-")
+        partes = partes.where(partes.str.len() == 3, fecha.str.split("/"))
+        fecha = (partes.str[0] + partes.str[1] + "20" + partes.str[2]).where(partes.str.len() >= 3)
+        importe = edo_cta.loc[facts, "Retiros"].where(edo_cta.loc[facts, "Retiros"] > 0, edo_cta.loc[facts, "Depósitos"])
+        importe = importe.astype(str).str.replace(".", "", regex=False).str.replace(",", "", regex=False)
+        cve[facts] = fecha + "_" + importe
+    # número de autorización, con sufijo "_IVA" o "_COM" según la descripción
+    autorizacion = regla == "autorizacion"
+    if autorizacion.any():
+        desc_aut = descripcion[autorizacion]
+        iva = desc_aut.str.match(r"(^| )IVA(COM| |$)", case=False)
+        com = desc_aut.str.contains("COM.", regex=False) | desc_aut.str.contains("COMISION", regex=False)
+        cve[autorizacion] = cve[autorizacion] + np.where(iva, "_IVA", np.where(com, "_COM", ""))
+    # si no se cumple ninguna regla, la clave queda como NaN
+    return cve
+
+def fechas_bnx(fechas:pd.Series)->pd.Series:
+    """Convierte las fechas del csv ("dd-mm-aa", "dd-mm-aaaa" o "dd/mm/aa") a datetime."""
+    fechas = fechas.str.replace('/', '-')
+    fechas = fechas.str.replace(r'(\d{2}-\d{2})-(\d{2})$', r'\1-20\2', regex=True)
+    # verificamos si la fecha tiene el formato correcto
+    if not all(re.match(r'^\d{2}-\d{2}-\d{4}$', str(date)) for date in fechas):
+        raise ValueError("Formato de fecha incorrecto en la columna 'FECHA'")
+    return pd.to_datetime(fechas, format="%d-%m-%Y", errors="raise")
+
+def huella_bnx(df:pd.DataFrame)->pd.DataFrame:
+    """Campos que identifican cada movimiento leído en el procesamiento incremental (ver `utils.campos_huella`)."""
+    return campos_huella(fechas_bnx(df["Fecha"]), df["Depósitos"] - df["Retiros"], df["Saldo"],
+                         df.drop(columns=["Fecha", "Depósitos", "Retiros", "Saldo"]))
+
 def format_bnx(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     # formateamos el DataFrame para que tenga las columnas necesarias
     # y renombramos las columnas
@@ -160,12 +247,7 @@ def format_bnx(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["ABONO"] = edo_cta["ABONO"].fillna(0)
     edo_cta["CARGO"] = edo_cta["CARGO"].fillna(0)
     # convertimos la columna "Fecha" a tipo datetime
-    edo_cta["FECHA"] = edo_cta["FECHA"].str.replace('/', '-')
-    edo_cta["FECHA"] = edo_cta["FECHA"].str.replace(r'(\d{2}-\d{2})-(\d{2})$', r'\1-20\2', regex=True)
-    # verificamos si la fecha tiene el formato correcto
-    if not all(re.match(r'^\d{2}-\d{2}-\d{4}$', str(date)) for date in edo_cta["FECHA"]):
-        raise ValueError("Formato de fecha incorrecto en la columna 'FECHA'")
-    edo_cta["FECHA"] = pd.to_datetime(edo_cta["FECHA"], format="%d-%m-%Y", errors="raise")
+    edo_cta["FECHA"] = fechas_bnx(edo_cta["FECHA"])
     # convertimos la columna "Descripción" a tipo string
     edo_cta["DESCRIPCIÓN"] = edo_cta["DESCRIPCIÓN"].astype(str)
     # extraemos de la descripción el patrón "(.+)Referencia N[úu]m[ée]rica:\s*(.+)(Autorización:\s*\d+)"
@@ -184,4 +266,5 @@ def format_bnx(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     # la descripcion ya está impícita en el concepto, la referencia y la referencia bancaria 
     edo_cta["DESCRIPCIÓN"] = "#"
 
-    return edo_cta
\ No newline at end of file
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
\ No newline at end of file
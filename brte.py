@@ -1,21 +1,20 @@
 import pandas as pd
 import re
 import numpy as np
-from utils import get_encoding
+from utils import leer_csv, leer_csv_por_bloques, asignar_pendientes, parsear_fechas, campos_huella, tipar_edo_cta
+from extractor import ExtractorClaves, PATRON_PAGO, PATRON_TRASPASO, PATRON_NOMINA
 
-def preprocess_brte(uploaded_file)->pd.DataFrame:
-    # para Banorte, se recibe como .csv
-    encoding = get_encoding(uploaded_file)
-    uploaded_file.seek(0)  # reiniciar el puntero del archivo
-    df = pd.read_csv(uploaded_file, encoding=encoding, sep=",",
-                     dtype={
-                            "REFERENCIA": str,
-                            "DESCRIPCIÓN": str,
-                            "COD. TRANSAC": str,
-                            "SUCURSAL": str,
-                            "MOVIMIENTO": str,
-                            "DESCRIPCIÓN DETALLADA": str,
-                     })
+# columnas de texto del csv de Banorte
+DTYPES_BRTE = {
+    "REFERENCIA": str,
+    "DESCRIPCIÓN": str,
+    "COD. TRANSAC": str,
+    "SUCURSAL": str,
+    "MOVIMIENTO": str,
+    "DESCRIPCIÓN DETALLADA": str,
+}
+
+def limpiar_brte(df:pd.DataFrame)->pd.DataFrame:
     # DEPóSITOS, RETIROS y SALDO son columnas que contienen valores numéricos
     # convertimos las columnas "DEPÓSITOS", "RETIROS" y "SALDO" a tipo numérico rellenando los nulos y '-' con 0
     df["DEPÓSITOS"] = pd.to_numeric(df["DEPÓSITOS"].astype(str).str.replace(",", "").str.replace(" ", "").str.replace("-", "0").str.replace("$",""), errors="raise").fillna(0)
@@ -24,6 +23,17 @@ def preprocess_brte(uploaded_file)->pd.DataFrame:
 
     return df
 
+def preprocess_brte(uploaded_file)->pd.DataFrame:
+    # para Banorte, se recibe como .csv
+    df = leer_csv(uploaded_file, "Banorte", sep=",", dtype=DTYPES_BRTE)
+
+    return limpiar_brte(df)
+
+def iter_brte(uploaded_file, chunksize:int):
+    """Lee el csv de Banorte en bloques de `chunksize` filas, detectando la codificación con una muestra del inicio del archivo (ver `utils.leer_csv_por_bloques`)."""
+    for df in leer_csv_por_bloques(uploaded_file, chunksize, "Banorte", sep=",", dtype=DTYPES_BRTE):
+        yield limpiar_brte(df)
+
 def asign_cve_brte(row):
     desc = row["DESCRIPCIÓN"].strip()
     det = row["DESCRIPCIÓN DETALLADA"].strip()
@@ -53,6 +63,27 @@ def asign_cve_brte(row):
         cve += "_COM"    
     return cve
 
+# reglas de clave de Banorte sobre la descripción detallada, en orden de prioridad
+EXTRACTOR_BRTE = ExtractorClaves([
+    ("pago", PATRON_PAGO),
+    ("traspaso", PATRON_TRASPASO),
+    ("nomina", PATRON_NOMINA, "NOM "),
+])
+
+def asign_cve_brte_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_brte`: resuelve la cascada de reglas con `EXTRACTOR_BRTE`, que evalúa regla por regla sobre las descripciones detalladas distintas que siguen sin clave."""
+    desc = edo_cta["DESCRIPCIÓN"].str.strip()
+    det = edo_cta["DESCRIPCIÓN DETALLADA"].str.strip()
+    cve = EXTRACTOR_BRTE.extraer(det)["clave"]
+    pendientes = cve.isna()
+    #__________________________________________________________________________________________________________
+    # el movimiento con sufijo "_IVA" o "_COM" según la descripción
+    iva = desc.str.contains("IVA", regex=False)
+    com = desc.str.contains("COM", regex=False)
+    valores = edo_cta["MOVIMIENTO"].str.strip() + np.where(iva, "_IVA", np.where(com, "_COM", ""))
+    asignar_pendientes(cve, pendientes, valores[pendientes], resueltas=pendientes.index[pendientes])
+    return cve
+
 def extract_beneficiario(row):
     # Buscar cuenta
     cuenta_match = re.search(r"CUENTA:\s*(\d+)", row["DESCRIPCIÓN"])
@@ -80,31 +111,14 @@ def extract_beneficiario(row):
     
     return beneficiario.strip()
 
-def parse_fecha_multiple_formatos(fecha_str):
-    """Parsea fechas en múltiples formatos: %d/%m/%Y o %d/mes_abreviado/año."""
-    fecha_str = str(fecha_str).strip()
-    
-    # Mapeo de meses en español abreviados
-    meses_es = {
-        'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
-        'jul': 7, 'ago': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12
-    }
-    
-    # Intenta con el formato original (día/mes_número/año)
-    try:
-        return pd.to_datetime(fecha_str, format="%d/%m/%Y")
-    except:
-        pass
-    
-    # Intenta con formato de mes en español (ej: 22/jun./2026)
-    match = re.search(r'(\d{1,2})/([a-z]{3})\.?/(\d{4})', fecha_str, re.IGNORECASE)
-    if match:
-        dia, mes_es, año = match.groups()
-        mes_num = meses_es.get(mes_es.lower())
-        if mes_num:
-            return pd.to_datetime(f"{int(dia):02d}/{mes_num:02d}/{año}", format="%d/%m/%Y")
-    
-    raise ValueError(f"No se puede parsear la fecha: {fecha_str}")
+def fechas_brte(fechas:pd.Series)->pd.Series:
+    """Convierte las fechas del csv a datetime; soporta "dd/mm/aaaa" y "dd/mes abreviado/aaaa" (p. ej. "22/jun./2026")."""
+    return parsear_fechas(fechas, "%d/%m/%Y", normalizar=lambda x: x.str.strip(), meses_es=True)
+
+def huella_brte(df:pd.DataFrame)->pd.DataFrame:
+    """Campos que identifican cada movimiento leído en el procesamiento incremental (ver `utils.campos_huella`)."""
+    return campos_huella(fechas_brte(df["FECHA"]), df["DEPÓSITOS"] - df["RETIROS"], df["SALDO"],
+                         df.drop(columns=["FECHA", "DEPÓSITOS", "RETIROS", "SALDO"]))
 
 def format_brte(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     # formateamos el DataFrame para que tenga las columnas necesarias
@@ -116,8 +130,8 @@ def format_brte(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
         "DESCRIPCIÓN": "CONCEPTO",
         "DESCRIPCIÓN DETALLADA": "DESCRIPCIÓN",
     })
-    # fecha a datetime - soporta múltiples formatos
-    edo_cta["FECHA"] = edo_cta["FECHA"].apply(parse_fecha_multiple_formatos)
+    # fecha a datetime
+    edo_cta["FECHA"] = fechas_brte(edo_cta["FECHA"])
     # armamos la referencia bancaria con el código de transacción y la sucursal
     edo_cta["REFERENCIA BANCARIA"] = ('Cod. Transacción: ' + edo_cta["COD. TRANSAC"] +' ' + 'Sucursal: ' + edo_cta["SUCURSAL"])
     edo_cta["BENEFICIARIO"] = edo_cta.apply(extract_beneficiario, axis=1)
@@ -125,4 +139,5 @@ def format_brte(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["BANCO"] = "Banorte"
     edo_cta["CUENTA"] = cta
     
-    return edo_cta
\ No newline at end of file
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
\ No newline at end of file
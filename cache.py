@@ -0,0 +1,104 @@
+import os
+import hashlib
+import tempfile
+import functools
+import pandas as pd
+from config import DIR_CACHE, MAX_BYTES_CACHE, MODULOS_BANCO
+from utils import tipar_edo_cta
+
+# módulos cuyo código determina el resultado de asign_cve (cves.py y lo que importa, más el módulo de cada banco);
+# si cambia cualquiera, cambia la versión de reglas
+MODULOS_REGLAS = (["cves.py", "extractor.py", "incremental.py", "perfil.py", "utils.py", "config.py"]
+                  + [f"{modulo}.py" for modulo in MODULOS_BANCO.values()])
+
+@functools.lru_cache(maxsize=None)
+def version_reglas() -> str:
+    """Hash del código fuente de los módulos de reglas; invalida el caché en cuanto se modifica cualquiera de ellos."""
+    h = hashlib.sha256()
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    for modulo in MODULOS_REGLAS:
+        with open(os.path.join(carpeta, modulo), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+def llave_cache(contenido: bytes, bank: str, cta: str) -> str:
+    """Llave del resultado de un estado de cuenta: hash del contenido, banco, cuenta y versión de reglas."""
+    h = hashlib.sha256(contenido)
+    h.update(f"|{bank}|{cta}|{version_reglas()}".encode("utf-8"))
+    return h.hexdigest()
+
+def _ruta(llave: str) -> str:
+    return os.path.join(DIR_CACHE, f"{llave}.parquet")
+
+def leer_cache(llave: str) -> pd.DataFrame:
+    """Regresa el DataFrame guardado con la llave, o None si no está en caché."""
+    ruta = _ruta(llave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        df = pd.read_parquet(ruta)
+    except Exception:
+        # archivo dañado o incompleto: lo descartamos y se trata como si no estuviera en caché (se vuelve a procesar)
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            # otra sesión ya lo eliminó
+            pass
+        return None
+    # actualizamos la fecha de modificación para que el desalojo sea por uso más reciente
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        # otra sesión lo desalojó después de leerlo; el resultado leído sigue siendo válido
+        pass
+    # el texto se lee de Parquet como string de Python; se regresa con los tipos de config.TIPOS_EDO_CTA
+    return tipar_edo_cta(df)
+
+def guardar_cache(llave: str, df: pd.DataFrame, avisos: list = None, max_bytes: int = MAX_BYTES_CACHE, reglas_tipo: list = None):
+    """
+    Guarda el DataFrame en caché y desaloja los resultados menos usados si se supera `max_bytes`.
+    Los avisos y el conteo por regla de tipo de movimiento del procesamiento se guardan en los metadatos del Parquet
+    (df.attrs["avisos"] y df.attrs["reglas_tipo"] al leerlo).
+    """
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    ruta = _ruta(llave)
+    # escribimos a un temporal propio de esta escritura (otras sesiones pueden guardar la misma llave a la vez)
+    # y lo renombramos para que nunca quede un archivo a medias con la llave final
+    descriptor, temporal = tempfile.mkstemp(dir=DIR_CACHE, suffix=".tmp")
+    os.close(descriptor)
+    copia = df.copy(deep=False)
+    copia.attrs = {"avisos": list(avisos or []), "reglas_tipo": reglas_tipo}
+    try:
+        copia.to_parquet(temporal)
+        os.replace(temporal, ruta)
+    except Exception:
+        try:
+            os.remove(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+    limpiar_cache(max_bytes)
+
+def limpiar_cache(max_bytes: int = MAX_BYTES_CACHE):
+    """Elimina los resultados usados hace más tiempo hasta que el caché ocupe como máximo `max_bytes`."""
+    if not os.path.isdir(DIR_CACHE):
+        return
+    archivos = []
+    for entrada in os.scandir(DIR_CACHE):
+        if entrada.name.endswith(".parquet"):
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                # otra sesión lo eliminó después de listar la carpeta
+                continue
+            archivos.append((info.st_mtime, info.st_size, entrada.path))
+    total = sum(tamano for _, tamano, _ in archivos)
+    for _, tamano, ruta in sorted(archivos):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            # otra sesión ya lo eliminó
+            pass
+        total -= tamano
@@ -0,0 +1,163 @@
+"""
+Procesamiento por lotes de estados de cuenta desde la línea de comandos, sin Streamlit.
+
+Ejemplos:
+    python cli.py estados/ --banco Banamex --cuenta 828
+    python cli.py "estados/*.csv" "estados/*.xlsx" --mapeo mapeo.json --formato Parquet --salida salida/
+
+El archivo de mapeo es un JSON {patrón del nombre de archivo: [banco, cuenta]}, p. ej.
+    {"*828*.csv": ["Banamex", "828"], "*019*.xlsx": ["HSBC", "019"]}
+Se escribe un archivo por cuenta con todos sus estados de cuenta.
+Con --traspasos se concilian además los traspasos TMLG entre todas las cuentas procesadas (traspasos.py)
+y se escriben traspasos_conciliados.csv, traspasos_ambiguos.csv y traspasos_sin_contraparte.csv.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import fnmatch
+import argparse
+import pandas as pd
+from config import CUENTAS, TYPES_EDO_CTA, FILAS_POR_BLOQUE, MAX_WORKERS
+from paralelo import procesar_tareas, concatenar_resultados
+from export import FORMATOS_EXPORTACION
+from traspasos import conciliar_traspasos, resumen_traspasos
+from validacion import validar_edo_cta, hay_problemas
+from cves import resumen_reglas_tipo
+
+def buscar_archivos(entradas: list) -> list:
+    """Expande directorios (archivos con las extensiones aceptadas) y patrones glob; sin repetidos y en orden."""
+    extensiones = {f".{ext}" for ext in TYPES_EDO_CTA.values()}
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += [os.path.join(entrada, nombre) for nombre in sorted(os.listdir(entrada))
+                      if os.path.splitext(nombre)[1].lower() in extensiones]
+        else:
+            rutas += sorted(glob.glob(entrada))
+    return list(dict.fromkeys(ruta for ruta in rutas if os.path.isfile(ruta)))
+
+def asignar_banco_cuenta(rutas: list, banco: str = None, cuenta: str = None, mapeo: dict = None) -> tuple:
+    """
+    Regresa la lista de (ruta, banco, cuenta) de los archivos a procesar y la lista de archivos sin banco asignado.
+    El mapeo por patrón de nombre tiene prioridad sobre --banco/--cuenta.
+    """
+    asignados, sin_asignar = [], []
+    for ruta in rutas:
+        nombre = os.path.basename(ruta)
+        destino = next((tuple(valor) for patron, valor in (mapeo or {}).items() if fnmatch.fnmatch(nombre, patron)), None)
+        if destino is None and banco is not None:
+            destino = (banco, cuenta)
+        if destino is None:
+            sin_asignar.append(ruta)
+        else:
+            asignados.append((ruta, *destino))
+    return asignados, sin_asignar
+
+def escribir_salida(df: pd.DataFrame, carpeta: str, banco: str, cuenta: str, formato: str) -> str:
+    """Escribe el resultado de una cuenta en el formato elegido (export.FORMATOS_EXPORTACION) y regresa la ruta."""
+    exportar, extension, _ = FORMATOS_EXPORTACION[formato]
+    nombre = f"claves_{banco}_{cuenta}".replace(" ", "_").replace("(", "").replace(")", "")
+    ruta = os.path.join(carpeta, f"{nombre}.{extension}")
+    exportar(df=df, output_file=ruta, bank=banco, account=cuenta)
+    return ruta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asigna claves a estados de cuenta por lotes.")
+    parser.add_argument("entradas", nargs="+", help="directorios o patrones glob con los estados de cuenta")
+    parser.add_argument("--banco", choices=list(CUENTAS.keys()), help="banco de todos los archivos")
+    parser.add_argument("--cuenta", help="cuenta de todos los archivos (requiere --banco)")
+    parser.add_argument("--mapeo", help="JSON {patrón de nombre de archivo: [banco, cuenta]}")
+    parser.add_argument("--salida", default=".", help="carpeta donde se escriben los resultados (por defecto la actual)")
+    parser.add_argument("--formato", choices=list(FORMATOS_EXPORTACION.keys()), default="Excel")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="número máximo de procesos")
+    parser.add_argument("--sin-cache", action="store_true", help="no leer ni escribir el caché de resultados")
+    parser.add_argument("--traspasos", action="store_true", help="conciliar los traspasos TMLG entre las cuentas procesadas")
+    parser.add_argument("--incremental", action="store_true", help="procesar solo los movimientos que no están en el almacén incremental de la cuenta")
+    args = parser.parse_args(argv)
+
+    if args.banco is not None and args.cuenta is None:
+        parser.error("--banco requiere --cuenta")
+    if args.banco is None and args.mapeo is None:
+        parser.error("se requiere --banco/--cuenta o --mapeo")
+    mapeo = None
+    if args.mapeo is not None:
+        with open(args.mapeo, encoding="utf-8") as f:
+            mapeo = json.load(f)
+
+    inicio = time.perf_counter()
+    asignados, sin_asignar = asignar_banco_cuenta(buscar_archivos(args.entradas), args.banco, args.cuenta, mapeo)
+    for ruta in sin_asignar:
+        print(f"Sin banco/cuenta en el mapeo, se omite: {ruta}")
+    for ruta, banco, cuenta in asignados:
+        if banco not in CUENTAS or cuenta not in CUENTAS[banco]:
+            print(f"Aviso: {banco}/{cuenta} no está en config.CUENTAS ({ruta})")
+    if not asignados:
+        print("No hay archivos para procesar.")
+        return 1
+
+    tareas = []
+    for ruta, banco, cuenta in asignados:
+        with open(ruta, "rb") as f:
+            tareas.append((ruta, f.read(), banco, cuenta))
+    resultados = procesar_tareas(tareas, max_workers=args.workers, usar_cache=not args.sin_cache,
+                                 chunksize=FILAS_POR_BLOQUE, incremental=args.incremental)
+    fin_proceso = time.perf_counter()
+
+    # un archivo de salida por cuenta, con los estados de cuenta en el orden en que se encontraron
+    os.makedirs(args.salida, exist_ok=True)
+    por_cuenta, validaciones = {}, []
+    for (_, _, banco, cuenta), resultado in zip(tareas, resultados):
+        por_cuenta.setdefault((banco, cuenta), []).append(resultado)
+    salidas = []
+    for (banco, cuenta), resultados_cuenta in por_cuenta.items():
+        df = concatenar_resultados(resultados_cuenta)
+        if df is not None:
+            salidas.append(escribir_salida(df, args.salida, banco, cuenta, args.formato))
+            validaciones.append(validar_edo_cta(df))
+    conciliacion = None
+    todos = concatenar_resultados(resultados) if args.traspasos else None
+    if todos is not None:
+        conciliacion = conciliar_traspasos(todos)
+        for estado, pares in conciliacion.items():
+            ruta = os.path.join(args.salida, f"traspasos_{estado}.csv")
+            pares.to_csv(ruta, index=False)
+            salidas.append(ruta)
+    fin = time.perf_counter()
+
+    # resumen de tiempos
+    print(f"\n{'archivo':<50} {'banco':<10} {'cuenta':<10} {'filas':>8} {'seg':>8}  estado")
+    filas_total = 0
+    for (ruta, _, banco, cuenta), resultado in zip(tareas, resultados):
+        filas = 0 if resultado["df"] is None else len(resultado["df"])
+        filas_total += filas
+        if resultado["error"] is not None:
+            estado = "ERROR " + resultado["error"].splitlines()[0]
+        else:
+            estado = "caché" if resultado["cache"] else "ok"
+        print(f"{os.path.basename(ruta):<50} {banco:<10} {cuenta:<10} {filas:>8} {resultado['segundos']:>8.2f}  {estado}")
+    for (ruta, _, _, _), resultado in zip(tareas, resultados):
+        for aviso in resultado["avisos"]:
+            print(f"Aviso en {os.path.basename(ruta)}: {aviso}")
+    segundos = fin_proceso - inicio
+    print(f"\n{len(tareas)} archivos, {filas_total} filas en {segundos:.2f} s "
+          f"({filas_total / segundos if segundos else 0:,.0f} filas/s); escritura {fin - fin_proceso:.2f} s")
+    reglas = resumen_reglas_tipo(resultado["reglas_tipo"] for resultado in resultados)
+    if reglas["FILAS"].any():
+        print("\nFilas por regla de tipo de movimiento:")
+        print(reglas[reglas["FILAS"] > 0].sort_values("FILAS", ascending=False).to_string(index=False))
+    problemas = [reporte["resumen"] for reporte in validaciones if hay_problemas(reporte)]
+    if problemas:
+        print("\nValidación (cuentas con rupturas de saldo, duplicados o movimientos sin importe):")
+        print(pd.concat(problemas, ignore_index=True).to_string(index=False))
+    if conciliacion is not None:
+        print("\nTraspasos entre cuentas MLG:")
+        print(resumen_traspasos(conciliacion).to_string(index=False))
+    for ruta in salidas:
+        print(f"Escrito: {ruta}")
+    errores = sum(resultado["error"] is not None for resultado in resultados)
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
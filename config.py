@@ -1,6 +1,30 @@
+import os
 COLS_EDO_CTA = ['BANCO','CUENTA', 'FECHA', 'DESCRIPCIÓN', 'CONCEPTO', 'REFERENCIA', 'REFERENCIA BANCARIA', 'BENEFICIARIO',
                 'DETALLE', 'CARGO', 'ABONO', 'SALDO', 'CLAVE', 'TIPO MOVIMIENTO']
+# tipo de cada columna del resultado (utils.tipar_edo_cta): categorías para las columnas con pocos valores distintos,
+# texto de Arrow para el texto libre y SALDO como flotante con nulos (el "#" de PNC queda nulo)
+TIPOS_EDO_CTA = {
+    'BANCO': 'category',
+    'CUENTA': 'category',
+    'FECHA': 'datetime64[ns]',
+    'DESCRIPCIÓN': 'string[pyarrow]',
+    'CONCEPTO': 'string[pyarrow]',
+    'REFERENCIA': 'string[pyarrow]',
+    'REFERENCIA BANCARIA': 'string[pyarrow]',
+    'BENEFICIARIO': 'string[pyarrow]',
+    'DETALLE': 'string[pyarrow]',
+    'CARGO': 'float64',
+    'ABONO': 'float64',
+    'SALDO': 'Float64',
+    'CLAVE': 'string[pyarrow]',
+    'TIPO MOVIMIENTO': 'category',
+}
 ENCODINGS = ['latin-1', 'utf-8', 'ISO-8859-1']
+# codificación conocida de los archivos de cada banco; los bancos que no aparecen se detectan con chardet
+ENCODING_BANCO = {
+    'Banamex': 'latin-1',
+    'BBVA': 'latin-1',
+}
 CUENTAS = {
     'Banamex': ['828','829','434'],
     'Santander': ['383', '383 (INV)', '357'],
@@ -9,6 +33,15 @@ CUENTAS = {
     'Banorte': ['858'],
     'PNC': ['865','891']
 }
+# módulo de cada banco; cves lo importa solo cuando se procesa un estado de cuenta de ese banco
+MODULOS_BANCO = {
+    'Banamex': 'bnx',
+    'Santander': 'stder',
+    'HSBC': 'hsbc',
+    'BBVA': 'bbva',
+    'Banorte': 'brte',
+    'PNC': 'pnc'
+}
 # extensiones de archivo aceptadas para cada estado de cuenta
 TYPES_EDO_CTA = {
     'Banamex':'csv',
@@ -17,4 +50,37 @@ TYPES_EDO_CTA = {
     'BBVA': 'txt',
     'Banorte': 'csv',
     'PNC': 'csv'
-}
\ No newline at end of file
+}
+# número de filas por bloque al leer por bloques los csv grandes (Banamex, Santander y Banorte)
+FILAS_POR_BLOQUE = 50000
+# bytes del inicio del archivo que se usan para detectar la codificación
+BYTES_MUESTRA_ENCODING = 1024 * 1024
+# archivos distintos cuya codificación detectada se recuerda (utils.get_encoding); se olvidan los usados hace más tiempo
+MAX_ENCODINGS_DETECTADOS = 1000
+# número máximo de procesos para procesar varios estados de cuenta en paralelo
+MAX_WORKERS = os.cpu_count() or 1
+# volumen mínimo (bytes sumados de todos los archivos) para usar procesos; con menos se procesa en serie
+MIN_BYTES_PARALELO = 2 * 1024 * 1024
+# carpeta y tamaño máximo del caché en disco de estados de cuenta ya procesados
+DIR_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_claves")
+MAX_BYTES_CACHE = 500 * 1024 * 1024
+# a partir de este número de filas el Excel se escribe en modo de alto volumen (export.export_to_excel_rapido)
+FILAS_EXCEL_ALTO_VOLUMEN = 50000
+# filas que se muestrean para estimar el ancho de las columnas del Excel
+MUESTRA_ANCHO_EXCEL = 10000
+# lector del xlsx de HSBC: "calamine" (requiere python-calamine), "openpyxl_rapido" (solo lectura, sin objetos de celda)
+# u "openpyxl" (pd.read_excel); None elige calamine si está instalado y si no openpyxl_rapido
+MOTOR_EXCEL_HSBC = None
+# textos distintos (con sus reglas deshabilitadas) cuya clave recuerda cada extractor entre llamadas; 0 desactiva la memoria
+MAX_MEMO_CLAVES = 100000
+# almacén de movimientos ya procesados del modo incremental (incremental.py), uno por banco y cuenta
+DIR_INCREMENTAL = os.path.join(DIR_CACHE, "incremental")
+MAX_FILAS_INCREMENTAL = 500000
+# almacén SQLite de los movimientos procesados (almacen.py)
+RUTA_ALMACEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "movimientos.sqlite")
+# días que pueden pasar entre la salida y la entrada de un traspaso entre cuentas MLG (traspasos.py)
+VENTANA_DIAS_TRASPASOS = 3
+# movimientos de traspaso que lee del almacén la página de traspasos (pages/Traspasos.py) para un periodo
+MAX_MOVIMIENTOS_TRASPASOS = 200000
+# diferencia máxima entre el saldo y el saldo anterior más abono menos cargo antes de marcar una ruptura (validacion.py)
+TOLERANCIA_SALDO = 0.005
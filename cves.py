@@ -1,12 +1,46 @@
 import re
+import importlib
+import traceback
+import warnings
+import numpy as np
 import pandas as pd
-from bnx import asign_cve_bnx, preprocess_bnx, format_bnx
-from stder import asign_cve_stder, preprocess_stder, format_stder
-from hsbc import asign_cve_hsbc, preprocess_hsbc, format_hsbc
-from bbva import asign_cve_bbva, preprocess_bbva, format_bbva
-from pnc import asign_cve_pnc, preprocess_pnc, format_pnc
-from brte import asign_cve_brte, preprocess_brte, format_brte
-from config import COLS_EDO_CTA
+from config import COLS_EDO_CTA, MODULOS_BANCO
+from utils import AvisoEdoCta, tipar_edo_cta, concatenar_edo_cta
+from perfil import Perfil, SIN_PERFIL
+from incremental import AlmacenIncremental
+
+# reglas de clasificación del tipo de movimiento, en orden de prioridad (gana la primera que se cumple)
+# cada regla indica el banco al que aplica (None = todos), las condiciones (columna, "match" o "search", patrón
+# y, opcionalmente, una transformación que se aplica al texto antes de evaluar el patrón),
+# la condición de importe ("ABONO" o "CARGO" mayor a 0, o None) y el tipo de movimiento asignado
+REGLAS_TIPO_MOVIMIENTO = [
+    {"banco": None, "condiciones": [("CLAVE", "match", re.compile(r"T\d{10}"))], "importe": None, "tipo": "PAGO A PROVEEDOR"},
+    {"banco": None, "condiciones": [("CLAVE", "match", re.compile(r"G\d{10}"))], "importe": None, "tipo": "PAGO A ACREEDOR"},
+    {"banco": None, "condiciones": [("CLAVE", "search", re.compile(r"COM"))], "importe": None, "tipo": "COMISIÓN"},
+    {"banco": None, "condiciones": [("CLAVE", "search", re.compile(r"IVA"))], "importe": None, "tipo": "IVA DE COMISIÓN"},
+    {"banco": "HSBC", "condiciones": [("DESCRIPCIÓN", "match", re.compile(r"CGO SPEI A "))], "importe": None, "tipo": "PAGO POR XML"},
+    {"banco": "HSBC", "condiciones": [("CLAVE", "match", re.compile(r"FIPP_"))], "importe": None, "tipo": "DISPOSICIÓN DE CRÉDITO"},
+    {"banco": "HSBC", "condiciones": [("CLAVE", "match", re.compile(r"CRE_"))], "importe": None, "tipo": "PAGO DE CRÉDITO CON INTERESES"},
+    {"banco": None, "condiciones": [("CLAVE", "match", re.compile(r"TMLG\d{6}"))], "importe": None, "tipo": "TRASPASO ENTRE CUENTAS MLG"},
+    {"banco": None, "condiciones": [("CLAVE", "match", re.compile(r"NPRO\d{6}"))], "importe": None, "tipo": "PAGO NO PROGRAMADO"},
+    {"banco": None, "condiciones": [("CLAVE", "match", re.compile(r"REEM\d{6}"))], "importe": None, "tipo": "REEMBOLSO DE GASTOS"},
+    # "XX 000" en el concepto de Banamex: abono es disposición, cargo es pago; si no es ninguno se queda sin tipo
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "search", re.compile(r"XX 000"))], "importe": "ABONO", "tipo": "DISPOSICIÓN DE CRÉDITO"},
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "search", re.compile(r"XX 000"))], "importe": "CARGO", "tipo": "PAGO DE CRÉDITO CON INTERESES"},
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "search", re.compile(r"XX 000"))], "importe": None, "tipo": None},
+    {"banco": "Banamex", "condiciones": [("CLAVE", "match", re.compile(r"88MIN[A-Za-z0-9]{15}|Y\d{16}"))], "importe": None, "tipo": "PAGO DE IMPUESTOS"},
+    {"banco": None, "condiciones": [("DETALLE", "search", re.compile(r"NOM ")), ("CLAVE", "match", re.compile(r"[A-Z]{3}\d[A-Z]{2}"))], "importe": None, "tipo": "PAGO DE NÓMINA"},
+    {"banco": None, "condiciones": [("DETALLE", "search", re.compile(r"COMPRA INVERSION"))], "importe": None, "tipo": "COMPRA DE INVERSIONES"},
+    # estas dos se evalúan sobre el texto en mayúsculas (str.upper), igual que en asign_tipo_movimiento
+    {"banco": None, "condiciones": [("DETALLE", "match", re.compile(r"VENTA (USD|DOLARES|DE DOLARES)"), str.upper)], "importe": None, "tipo": "VENTA DE DOLARES"},
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "search", re.compile(r"PAGO A TERCEROS\s+[A-Z0-9]+[\s$]"), str.upper)], "importe": "CARGO", "tipo": "PAGO REFERENCIADO"},
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "match", re.compile(r"^(?=[A-Z0-9]*\d)[A-Z0-9]+$"))], "importe": "CARGO", "tipo": "PAGO REFERENCIADO"},
+    {"banco": "Banamex", "condiciones": [("CONCEPTO", "search", re.compile(r"TRASPASO REF \d+ DE FO [0]*9"))], "importe": "ABONO", "tipo": "VENTA DE INVERSIÓN"},
+    {"banco": "PNC", "condiciones": [("DESCRIPCIÓN", "search", re.compile(r"WIRE TRANSFER IN|ACH CREDIT RECEIVED"))], "importe": None, "tipo": "ABONO DE CLIENTE"},
+    {"banco": "PNC", "condiciones": [("DESCRIPCIÓN", "search", re.compile(r"SWEEP|TRNSFR FR INVESTMENT"))], "importe": "ABONO", "tipo": "INVERSIÓN"},
+    {"banco": "PNC", "condiciones": [("DESCRIPCIÓN", "match", re.compile(r"ACCOUNT TRANSFER FROM [0]*4954859906"))], "importe": None, "tipo": "TRASPASO DE MLG LLC"},
+    {"banco": "Santander", "condiciones": [("CONCEPTO", "search", re.compile(r"CREDITO"))], "importe": None, "tipo": "LÍNEA DE CRÉDITO"},
+]
 
 def asign_tipo_movimiento(row: pd.Series) -> str:
     """
@@ -89,53 +123,218 @@ def asign_tipo_movimiento(row: pd.Series) -> str:
         return "OTRO"
     
 
-def asign_cve(path_edo_cta: str, bank: str, cta: str) -> pd.DataFrame:
+def _cumple_condicion(valores: np.ndarray, modo: str, patron: re.Pattern, transformacion=None) -> np.ndarray:
+    """
+    Evalúa el patrón de una condición sobre los valores dados: cada valor distinto se evalúa una sola vez
+    (con Series.str.match o Series.str.contains) y el resultado se reparte a todas las filas que lo tienen.
+    """
+    codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+    unicos = pd.Series(np.asarray(unicos, dtype=object), dtype=object)
+    if transformacion is not None:
+        unicos = unicos.map(transformacion, na_action="ignore")
+    if modo == "match":
+        coincide = unicos.str.match(patron, na=False)
+    else:
+        coincide = unicos.str.contains(patron, na=False)
+    return coincide.to_numpy(dtype=bool)[codigos]
+
+def clasificar_tipo_movimiento(edo_cta: pd.DataFrame, conteo: list = None) -> pd.Series:
+    """
+    Asigna el tipo de movimiento a todas las filas evaluando REGLAS_TIPO_MOVIMIENTO por columnas.
+    Las filas se separan por banco y a cada grupo solo se le aplican sus reglas, en orden de prioridad;
+    cada regla se evalúa únicamente sobre las filas que siguen sin tipo, una vez por valor distinto de la columna.
+    Con `conteo` (una lista con un número por regla), se le suma el número de filas que resolvió cada regla,
+    de modo que la misma lista acumula los bloques de un archivo.
+    """
+    tipos = pd.Series("OTRO", index=edo_cta.index, dtype=object)
+    for banco, posiciones in edo_cta.groupby("BANCO", sort=False, observed=True).indices.items():
+        grupo = edo_cta.iloc[posiciones]
+        pendientes = np.ones(len(grupo), dtype=bool)
+        for i, regla in enumerate(REGLAS_TIPO_MOVIMIENTO):
+            if regla["banco"] is not None and regla["banco"] != banco:
+                continue
+            cumple = pendientes.copy()
+            if regla["importe"] is not None:
+                cumple &= grupo[regla["importe"]].to_numpy() > 0
+            for columna, *evaluacion in regla["condiciones"]:
+                filas = np.flatnonzero(cumple)
+                cumple[filas] = _cumple_condicion(grupo[columna].to_numpy()[filas], *evaluacion)
+            if cumple.any():
+                tipos.iloc[posiciones[cumple]] = regla["tipo"]
+                if conteo is not None:
+                    conteo[i] += int(cumple.sum())
+                pendientes &= ~cumple
+    return tipos
+
+def resumen_reglas_tipo(conteos: list) -> pd.DataFrame:
+    """
+    Cuántas filas clasificó cada regla de tipo de movimiento, sumando los conteos dados
+    (el "reglas_tipo" de cada resultado de asign_cve_resultado; los None se ignoran).
+    """
+    filas = np.zeros(len(REGLAS_TIPO_MOVIMIENTO), dtype=int)
+    for conteo in conteos:
+        if conteo is not None:
+            filas += np.asarray(conteo, dtype=int)
+    return pd.DataFrame({
+        "REGLA": range(len(REGLAS_TIPO_MOVIMIENTO)),
+        "BANCO": [regla["banco"] for regla in REGLAS_TIPO_MOVIMIENTO],
+        "TIPO MOVIMIENTO": [regla["tipo"] for regla in REGLAS_TIPO_MOVIMIENTO],
+        "FILAS": filas,
+    })
+    
+def asignar_claves(edo_cta: pd.DataFrame, asign_fila, asign_vec, vectorizado: bool = True) -> pd.Series:
+    """
+    Evalúa la cascada de reglas de clave del banco sobre todo el DataFrame.
+    Con vectorizado=False se usa la función por fila, que sirve como ruta de referencia
+    para comparar resultados contra la versión vectorizada.
+    """
+    if vectorizado:
+        return asign_vec(edo_cta)
+    return edo_cta.apply(asign_fila, axis=1)
+
+def cargar_banco(bank: str) -> dict:
+    """
+    Importa el módulo del banco (config.MODULOS_BANCO) la primera vez que se procesa un estado de cuenta de ese banco
+    y regresa sus funciones: preprocess, iter (lectura por bloques), asign_fila, asign_vec, consolidar, format
+    y huella (campos que identifican cada movimiento leído en el procesamiento incremental).
+    Las funciones que el banco no tiene (lectura por bloques, consolidación, huella) quedan en None.
+    """
+    if bank not in MODULOS_BANCO:
+        raise ValueError(f"Banco no soportado: {bank}")
+    nombre = MODULOS_BANCO[bank]
+    modulo = importlib.import_module(nombre)
+    return {
+        "preprocess": getattr(modulo, f"preprocess_{nombre}"),
+        "iter": getattr(modulo, f"iter_{nombre}", None),
+        "asign_fila": getattr(modulo, f"asign_cve_{nombre}"),
+        "asign_vec": getattr(modulo, f"asign_cve_{nombre}_vec"),
+        "consolidar": getattr(modulo, f"consolidar_{nombre}", None),
+        "format": getattr(modulo, f"format_{nombre}"),
+        "huella": getattr(modulo, f"huella_{nombre}", None),
+    }
+
+def procesar_leido(edo_cta: pd.DataFrame, banco: dict, cta: str, vectorizado: bool = True, perfil=SIN_PERFIL,
+                   conteo_tipos: list = None) -> pd.DataFrame:
+    """
+    Asigna claves, consolida, formatea y postprocesa un estado de cuenta (o bloque) ya leído; `banco` es el de `cargar_banco`.
+    `conteo_tipos` acumula las filas clasificadas por cada regla de tipo de movimiento (ver `clasificar_tipo_movimiento`).
+    """
+    edo_cta["cve"] = perfil.medir("claves", asignar_claves, edo_cta, banco["asign_fila"], banco["asign_vec"], vectorizado)
+    # movimientos que el banco agrupa en uno solo (p. ej. los FIPP y créditos de HSBC)
+    if banco["consolidar"] is not None:
+        edo_cta = perfil.medir("consolidacion", banco["consolidar"], edo_cta)
+    edo_cta = perfil.medir("formato", banco["format"], edo_cta, cta)
+    return perfil.medir("postproceso", postprocesar, edo_cta, vectorizado, conteo_tipos)
+
+def asign_cve_por_bloques(path_edo_cta, bank: str, cta: str, chunksize: int, vectorizado: bool = True, perfil=SIN_PERFIL,
+                          almacen: AlmacenIncremental = None, conteo_tipos: list = None) -> pd.DataFrame:
+    """
+    Procesa el estado de cuenta en bloques de `chunksize` filas: cada bloque se preprocesa,
+    se le asignan claves y tipo de movimiento y se formatea antes de leer el siguiente,
+    de modo que en memoria solo se tiene un bloque del archivo a la vez además del resultado.
+    Con un almacén incremental, de cada bloque solo se procesan los movimientos que no están en el almacén.
+    """
+    banco = cargar_banco(bank)
+    bloques = []
+    lector = banco["iter"](path_edo_cta, chunksize)
+    while True:
+        edo_cta = perfil.medir("lectura", next, lector, None)
+        if edo_cta is None:
+            break
+        if almacen is None:
+            bloques.append(procesar_leido(edo_cta, banco, cta, vectorizado, perfil, conteo_tipos))
+        else:
+            bloques.append(almacen.procesar(edo_cta, lambda df: procesar_leido(df, banco, cta, vectorizado, perfil, conteo_tipos)))
+    if not bloques:
+        return tipar_edo_cta(pd.DataFrame(columns=COLS_EDO_CTA))
+    return perfil.medir("union_bloques", concatenar_edo_cta, bloques, filas_entrada=sum(len(bloque) for bloque in bloques))
+
+def asign_cve(path_edo_cta: str, bank: str, cta: str, vectorizado: bool = True, chunksize: int = None, perfil=None,
+              incremental: bool = False, conteo_tipos: list = None) -> pd.DataFrame:
     """
     Asigna la clave de la operación a cada fila del DataFrame edo_cta
     dependiendo del banco que se esté procesando.
+    Con vectorizado=False las claves se asignan fila por fila con las funciones asign_cve_<banco>.
+    Con chunksize, los bancos con lectura por bloques (Banamex, Santander y Banorte) se procesan por bloques de ese número de filas.
+    Con un perfil.Perfil se registran el tiempo, las filas y la memoria de cada etapa.
+    Con incremental, los movimientos que ya se procesaron antes para la misma cuenta se toman del almacén
+    (incremental.AlmacenIncremental) y solo se procesan los nuevos; no aplica a los bancos que consolidan movimientos.
+    Con `conteo_tipos` (una lista con un cero por regla de REGLAS_TIPO_MOVIMIENTO) se le suman las filas que clasificó
+    cada regla en todo el archivo (solo con vectorizado; con incremental, solo las de los movimientos nuevos).
     """
-    if bank == "Banamex":
-        edo_cta = preprocess_bnx(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_bnx, axis=1)
-        edo_cta = format_bnx(edo_cta, cta)
-    elif bank == "Santander":
-        edo_cta = preprocess_stder(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_stder, axis=1)
-        edo_cta = format_stder(edo_cta, cta)
-    elif bank == "HSBC":
-        edo_cta = preprocess_hsbc(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_hsbc, axis=1)
-        # agrupamos todos los abonos fipp (referencia bancaria '5203' y 'ABONO FIPP' en la descripción) por día (fecha del apunte)
-        # sumamos sus importes y sustituimos a todos estos movimientos por uno solo asignando la clave FIPP_[fecha]
-        # hacemos lo mismo con los créditos (referencia bancaria '1065'), asignando la clave "CRE_[fecha]"
-        fipps_ind = edo_cta[(edo_cta["Referencia bancaria"].isin(['1065','5203']))\
-                        & (edo_cta['Descripción'].str.contains(r"ABONO FIPP|CARGO CREDITO"))].copy()
-        fipps =  fipps_ind.groupby(["Referencia bancaria", "Fecha del apunte"]).agg({"Importe de crédito": "sum","Importe del débito": "sum"}).reset_index()
-        creds = fipps[fipps["Referencia bancaria"] == "1065"]
-        fipps = fipps[fipps["Referencia bancaria"] == "5203"]
-        fipps["cve"] = "FIPP_" + fipps["Fecha del apunte"].astype(str).str.replace("/", "").str.replace(" ", "").str.replace(":", "")
-        creds["cve"] = "CRE_" + creds["Fecha del apunte"].astype(str).str.replace("/", "").str.replace(" ", "").str.replace(":", "")
-        # eliminamos los fipps originales
-        edo_cta = edo_cta[~edo_cta.index.isin(fipps_ind.index)]
-        # unimos los fipps agrupados al dataframe original
-        edo_cta = pd.concat([edo_cta, fipps, creds], ignore_index=True)
-        # formateamos el dataframe
-        edo_cta = format_hsbc(edo_cta, cta)     
-
-    elif bank == "BBVA":
-        edo_cta = preprocess_bbva(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_bbva, axis=1)
-        edo_cta = format_bbva(edo_cta, cta)
-    elif bank == "PNC":
-        edo_cta = preprocess_pnc(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_pnc, axis=1)
-        edo_cta = format_pnc(edo_cta, cta)
-    elif bank == "Banorte":
-        edo_cta = preprocess_brte(path_edo_cta)
-        edo_cta["cve"] = edo_cta.apply(asign_cve_brte, axis=1)
-        edo_cta = format_brte(edo_cta, cta)
+    perfil = perfil or SIN_PERFIL
+    banco = cargar_banco(bank)
+    almacen = None
+    # los bancos que consolidan movimientos no tienen huella por movimiento leído
+    if incremental and banco["huella"] is not None:
+        almacen = perfil.medir("almacen_lectura", AlmacenIncremental, bank, cta, banco["huella"])
+    if chunksize is not None and banco["iter"] is not None:
+        edo_cta = asign_cve_por_bloques(path_edo_cta, bank, cta, chunksize, vectorizado, perfil, almacen, conteo_tipos)
     else:
-        raise ValueError(f"Banco no soportado: {bank}")
+        edo_cta = perfil.medir("lectura", banco["preprocess"], path_edo_cta)
+        if almacen is None:
+            return procesar_leido(edo_cta, banco, cta, vectorizado, perfil, conteo_tipos)
+        edo_cta = almacen.procesar(edo_cta, lambda df: procesar_leido(df, banco, cta, vectorizado, perfil, conteo_tipos))
+    if almacen is not None:
+        perfil.medir("almacen_guardado", almacen.guardar)
+    return edo_cta
+
+def asign_cve_resultado(path_edo_cta, bank: str, cta: str, perfilar: bool = False, cprofile: bool = False, memoria: bool = False,
+                        **kwargs) -> dict:
+    """
+    Igual que `asign_cve`, pero sin lanzar excepciones: regresa un diccionario con
+    "df" (None si hubo error), "avisos" (mensajes emitidos con utils.avisar) y "error" (texto del error o None),
+    para que la app o la CLI decidan cómo mostrarlos.
+    Con perfilar, "perfil" trae la medición por etapa (perfil.Perfil.como_dict); con memoria además el pico de memoria
+    de cada etapa y con cprofile el reporte de cProfile de la etapa más lenta.
+    "reglas_tipo" es el número de filas que clasificó cada regla de REGLAS_TIPO_MOVIMIENTO en todo el archivo
+    (ver `resumen_reglas_tipo`); None con vectorizado=False, que clasifica fila por fila.
+    """
+    perfil = Perfil(memoria=memoria, cprofile=cprofile) if perfilar or cprofile else None
+    conteo = [0] * len(REGLAS_TIPO_MOVIMIENTO) if kwargs.get("vectorizado", True) else None
+    with warnings.catch_warnings(record=True) as registrados:
+        warnings.simplefilter("always", AvisoEdoCta)
+        try:
+            df = asign_cve(path_edo_cta, bank, cta, perfil=perfil, conteo_tipos=conteo, **kwargs)
+            error = None
+        except Exception as e:
+            df, conteo = None, None
+            error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+        finally:
+            if perfil is not None:
+                perfil.detener()
+    avisos = []
+    for registrado in registrados:
+        if issubclass(registrado.category, AvisoEdoCta):
+            avisos.append(str(registrado.message))
+        else:
+            # el resto de las advertencias (p. ej. de pandas) se muestran como siempre
+            warnings.showwarning(registrado.message, registrado.category, registrado.filename, registrado.lineno)
+    return {"df": df, "avisos": avisos, "error": error, "perfil": perfil.como_dict() if perfil is not None else None,
+            "reglas_tipo": conteo}
+
+def postprocesar(edo_cta: pd.DataFrame, vectorizado: bool = True, conteo_tipos: list = None) -> pd.DataFrame:
+    """Limpia las columnas de texto, arma el detalle, recorta la clave y asigna el tipo de movimiento al estado de cuenta ya formateado."""
+    edo_cta = limpiar_columnas(edo_cta) if vectorizado else limpiar_columnas_por_fila(edo_cta)
+    edo_cta["TIPO MOVIMIENTO"] = asignar_tipo(edo_cta, vectorizado, conteo_tipos)
+    # eliminamos las columnas que no necesitamos y tipamos las que se limpiaron o agregaron aquí
+    edo_cta = tipar_edo_cta(edo_cta[COLS_EDO_CTA])
+    return edo_cta
+
+def limpiar_columnas(edo_cta: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza las columnas de texto, arma la columna "DETALLE" y limpia la clave (versión vectorizada de `limpiar_columnas_por_fila`)."""
+    # texto sin espacios al inicio y al final y con los espacios múltiples cambiados por uno solo
+    textos = ["DESCRIPCIÓN", "CONCEPTO", "REFERENCIA", "REFERENCIA BANCARIA"]
+    edo_cta[textos] = edo_cta[textos].astype(str).apply(lambda x: x.str.strip().str.replace(r'\s+', ' ', regex=True))
+    # en la columna "DETALLE" se concatenan todos los datos descriptores
+    edo_cta["DETALLE"] = edo_cta["DESCRIPCIÓN"].str.cat(edo_cta[["CONCEPTO", "REFERENCIA", "REFERENCIA BANCARIA", "BENEFICIARIO"]], sep='|')
+    # clave sin espacios ni ceros a la izquierda; para abonos, solo los últimos 12 caracteres
+    clave = edo_cta["CLAVE"].astype(str).str.strip().str.lstrip('0')
+    edo_cta["CLAVE"] = clave.mask(edo_cta["ABONO"].astype(float) > 0, clave.str[-12:])
+    return edo_cta
+
+def limpiar_columnas_por_fila(edo_cta: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza las columnas de texto, arma la columna "DETALLE" y limpia la clave, fila por fila."""
     # convertimos las columnas "DESCRIPCIÓN", "REFERENCIA", "REFERENCIA BANCARIA", "CONCEPTO" y "CLAVE" a string
     edo_cta[["DESCRIPCIÓN", "REFERENCIA", "REFERENCIA BANCARIA", "CONCEPTO", "CLAVE"]] = edo_cta[["DESCRIPCIÓN", "REFERENCIA", "REFERENCIA BANCARIA", "CONCEPTO", "CLAVE"]].astype(str)
     # eliminamos los espacios iniciales y finales de las columnas "CONCEPTO", "REFERENCIA", "REFERENCIA BANCARIA", "DESCRIPCIÓN" y "CLAVE"
@@ -152,12 +351,14 @@ def asign_cve(path_edo_cta: str, bank: str, cta: str) -> pd.DataFrame:
     edo_cta['CLAVE'] = edo_cta['CLAVE'].apply(lambda x: re.sub(r'^[0]+', '', x) if isinstance(x, str) else x)
     # para abonos, recortamos la clave hasta los últimos 12 caracteres
     edo_cta['CLAVE'] = edo_cta.apply(acortar_cve, axis=1)
-    # asignamos el tipo de movimiento a cada fila
-    edo_cta["TIPO MOVIMIENTO"] = edo_cta.apply(asign_tipo_movimiento, axis=1)
-    # eliminamos las columnas que no necesitamos
-    edo_cta = edo_cta[COLS_EDO_CTA]
     return edo_cta
 
+def asignar_tipo(edo_cta: pd.DataFrame, vectorizado: bool = True, conteo: list = None) -> pd.Series:
+    """Tipo de movimiento de cada fila; con vectorizado=False se usa la función por fila `asign_tipo_movimiento` (sin conteo por regla)."""
+    if vectorizado:
+        return clasificar_tipo_movimiento(edo_cta, conteo)
+    return edo_cta.apply(asign_tipo_movimiento, axis=1)
+
 def acortar_cve(row):
     if float(row['ABONO'])>0:
         return row['CLAVE'][-12:]
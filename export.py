@@ -1,4 +1,32 @@
+import math
+import xlsxwriter
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from config import COLS_EDO_CTA, FILAS_EXCEL_ALTO_VOLUMEN, MUESTRA_ANCHO_EXCEL
+from perfil import SIN_PERFIL
+
+# esquema fijo de los formatos columnares, en el orden de config.COLS_EDO_CTA;
+# BANCO, CUENTA y TIPO MOVIMIENTO tienen pocos valores distintos y se guardan como categorías (diccionario)
+CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+TIPOS_ARROW = {
+    'BANCO': CATEGORIA,
+    'CUENTA': CATEGORIA,
+    'FECHA': pa.timestamp('ns'),
+    'DESCRIPCIÓN': pa.string(),
+    'CONCEPTO': pa.string(),
+    'REFERENCIA': pa.string(),
+    'REFERENCIA BANCARIA': pa.string(),
+    'BENEFICIARIO': pa.string(),
+    'DETALLE': pa.string(),
+    'CARGO': pa.float64(),
+    'ABONO': pa.float64(),
+    'SALDO': pa.float64(),
+    'CLAVE': pa.string(),
+    'TIPO MOVIMIENTO': CATEGORIA,
+}
+ESQUEMA_EDO_CTA = pa.schema([(col, TIPOS_ARROW[col]) for col in COLS_EDO_CTA])
 
 def excel_col_letter(col_idx):
     """Convierte índice de columna (0-based) a letra de Excel (A, B, ..., Z, AA, AB, ...)"""
@@ -8,55 +36,174 @@ def excel_col_letter(col_idx):
         col_idx = col_idx // 26 - 1
     return letters
 
-def export_to_excel(df: pd.DataFrame, output_file, bank, account):
+def ancho_columna(serie: pd.Series, muestra: int = MUESTRA_ANCHO_EXCEL):
+    """Largo máximo del texto de la columna; en columnas de más de `muestra` filas se estima con una muestra."""
+    if len(serie) > muestra:
+        serie = serie.sample(muestra, random_state=0)
+    return serie.astype(str).str.len().max()
+
+def formatear_hoja(workbook, worksheet, df: pd.DataFrame):
+    """Escribe subtotales (fila 1) y encabezados (fila 2) y ajusta ancho y formato de cada columna."""
+    # Asignamos color a la pestaña
+    worksheet.set_tab_color('#C6EFCE')
+    # formato comma style
+    comma_format = workbook.add_format({'num_format': '#,##0.00'})
+    # Formato encabezado
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#C6EFCE', 'border': 2, 'font_color': '#000000'})
+    # Formato encabezado de columna "CLAVE"
+    cve_format = workbook.add_format({'bold': True, 'bg_color': '#FFF2CC', 'border': 2, 'font_color': '#000000'})
+    # subtotales de suma
+    subtotal_sum_format = workbook.add_format({
+        'bold': True,
+        'bg_color': '#FFF2CC',
+        'border': 2,
+        'font_color': '#000000',
+        'num_format': '#,##0.00'
+    })
+    # subtotales en la primera fila (en modo constant_memory las filas se tienen que escribir en orden)
+    last_row = len(df) + 2
+    for col_num, value in enumerate(df.columns):
+        col_letter = excel_col_letter(col_num)
+        if value=='CLAVE':
+            # subtotal para cuenta de movimientos
+            # La fórmula CONTAR va de la fila 3 (índice 2) hasta la última fila
+            formula = f'=SUBTOTAL(3, {col_letter}3:{col_letter}{last_row})'
+            worksheet.write_formula(0, col_num, formula, subtotal_sum_format)
+        # subtotales (suma) para importes
+        elif value in ['CARGO', 'ABONO', 'IMPORTE']:
+            # La fórmula SUMA va de la fila 3 (índice 2) hasta la última fila
+            formula = f'=SUBTOTAL(9, {col_letter}3:{col_letter}{last_row})'
+            worksheet.write_formula(0, col_num, formula,subtotal_sum_format)
+
+    for col_num, value in enumerate(df.columns):
+        # escribimos los encabezados
+        worksheet.write(1, col_num, value, cve_format if value=='CLAVE' else header_format)
+
+        # Ajusta el ancho de las columnas
+        max_len = max(ancho_columna(df[value]), len(value))
+        col_len = max_len + 2 if max_len < 30 else 30
+        # Aplica formato comma style a columnas numéricas
+        if pd.api.types.is_numeric_dtype(df[value]) and value not in ['Fecha de contabilización', 'FECHA', 'Diferencia fechas (días)', 'movimientos']:
+            worksheet.set_column(col_num, col_num, col_len, comma_format)
+        else:
+            worksheet.set_column(col_num, col_num, col_len)
+
+def export_to_excel(df: pd.DataFrame, output_file, bank, account, alto_volumen: bool = None, perfil=SIN_PERFIL):
+    """
+    Exporta el resultado a Excel con subtotales, encabezados de color y paneles inmovilizados.
+    Con alto_volumen (por defecto, a partir de config.FILAS_EXCEL_ALTO_VOLUMEN filas) se usa `export_to_excel_rapido`.
+    Con un perfil.Perfil se miden la escritura de datos, el formato de la hoja y el guardado del archivo.
+    """
+    if alto_volumen is None:
+        alto_volumen = len(df) >= FILAS_EXCEL_ALTO_VOLUMEN
+    if alto_volumen:
+        return export_to_excel_rapido(df, output_file, bank, account, perfil=perfil)
     sheet_name = f"{bank}_{account}"
-    with pd.ExcelWriter(output_file, engine='xlsxwriter', datetime_format='dd-mm-yyyy') as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name, freeze_panes=(2, 0), startrow=1)
+    writer = pd.ExcelWriter(output_file, engine='xlsxwriter', datetime_format='dd-mm-yyyy')
+    try:
+        perfil.medir("excel_datos", df.to_excel, writer, index=False, sheet_name=sheet_name, freeze_panes=(2, 0), startrow=1,
+                     filas_entrada=len(df))
 
         workbook = writer.book
-        # Asignamos color a la pestaña
         worksheet = writer.sheets[sheet_name]
-        worksheet.set_tab_color('#C6EFCE')
-        # formato comma style
-        comma_format = workbook.add_format({'num_format': '#,##0.00'})
-        # Formato encabezado
-        header_format = workbook.add_format({'bold': True, 'bg_color': '#C6EFCE', 'border': 2, 'font_color': '#000000'})
-        # Formato encabezado de columna "CLAVE"
-        cve_format = workbook.add_format({'bold': True, 'bg_color': '#FFF2CC', 'border': 2, 'font_color': '#000000'})
-        # subtotales de suma
-        subtotal_sum_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#FFF2CC',
-            'border': 2,
-            'font_color': '#000000',
-            'num_format': '#,##0.00'
-        })
-        for col_num, value in enumerate(df.columns):
-            # escribimos los encabezados
-            if value=='CLAVE':
-                worksheet.write(1, col_num, value, cve_format)
-                # subtotal para cuenta de movimientos
-                # La fórmula CONTAR va de la fila 3 (índice 2) hasta la última fila
-                last_row = len(df) + 2
-                col_letter = excel_col_letter(col_num)
-                formula = f'=SUBTOTAL(3, {col_letter}3:{col_letter}{last_row})'
-                worksheet.write_formula(0, col_num, formula, subtotal_sum_format)
-
-            else:
-                worksheet.write(1, col_num, value, header_format)
-                # subtotales (suma) para importes
-                if value in ['CARGO', 'ABONO', 'IMPORTE']:
-                    # La fórmula SUMA va de la fila 3 (índice 2) hasta la última fila
-                    last_row = len(df) + 2
-                    col_letter = excel_col_letter(col_num)
-                    formula = f'=SUBTOTAL(9, {col_letter}3:{col_letter}{last_row})'
-                    worksheet.write_formula(0, col_num, formula,subtotal_sum_format)
-
-            # Ajusta el ancho de las columnas
-            max_len = max(df[value].astype(str).map(len).max(), len(value))
-            col_len = max_len + 2 if max_len < 30 else 30
-            # Aplica formato comma style a columnas numéricas
-            if pd.api.types.is_numeric_dtype(df[value]) and value not in ['Fecha de contabilización', 'FECHA', 'Diferencia fechas (días)', 'movimientos']:
-                worksheet.set_column(col_num, col_num, col_len, comma_format)
-            else:
-                worksheet.set_column(col_num, col_num, col_len)
\ No newline at end of file
+        perfil.medir("excel_formato", formatear_hoja, workbook, worksheet, df)
+    except Exception:
+        # se cierra el archivo sin ocultar el error de la escritura
+        try:
+            writer.close()
+        except Exception:
+            pass
+        raise
+    perfil.medir("excel_guardado", writer.close)
+
+def export_to_excel_rapido(df: pd.DataFrame, output_file, bank, account, filas_por_bloque: int = 10000, perfil=SIN_PERFIL):
+    """
+    Igual que `export_to_excel`, pero para resultados grandes: escribe fila por fila con xlsxwriter en modo
+    `constant_memory`, que va pasando cada fila a disco en lugar de mantener la hoja completa en memoria.
+    Las columnas se convierten a listas por bloques de `filas_por_bloque` filas y cada celda se escribe
+    con el método de su tipo (texto, número o fecha); los nulos y textos vacíos quedan en blanco, como en `to_excel`.
+    """
+    sheet_name = f"{bank}_{account}"
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.freeze_panes(2, 0)
+    try:
+        # en modo constant_memory las filas se escriben en orden: primero subtotales y encabezados
+        perfil.medir("excel_formato", formatear_hoja, workbook, worksheet, df)
+        perfil.medir("excel_datos", _escribir_filas, workbook, worksheet, df, filas_por_bloque, filas_entrada=len(df))
+    except Exception:
+        # se cierra el archivo (y se borran sus temporales) sin ocultar el error de la escritura
+        try:
+            workbook.close()
+        except Exception:
+            pass
+        raise
+    perfil.medir("excel_guardado", workbook.close)
+
+def _escribir_filas(workbook, worksheet, df: pd.DataFrame, filas_por_bloque: int):
+    fecha_format = workbook.add_format({'num_format': 'dd-mm-yyyy'})
+
+    # tipo de escritura de cada columna
+    tipos = []
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            tipos.append("fecha")
+        elif pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            tipos.append("numero")
+        else:
+            tipos.append("texto")
+
+    for inicio in range(0, len(df), filas_por_bloque):
+        bloque = df.iloc[inicio:inicio + filas_por_bloque]
+        columnas = [bloque[col].astype(object).tolist() for col in df.columns]
+        for i, fila in enumerate(zip(*columnas)):
+            row = inicio + i + 2
+            for col_num, (tipo, valor) in enumerate(zip(tipos, fila)):
+                if valor is None or valor is pd.NaT or valor is pd.NA or valor == "" or (isinstance(valor, float) and math.isnan(valor)):
+                    continue
+                if tipo == "texto" and isinstance(valor, str):
+                    worksheet.write_string(row, col_num, valor)
+                elif tipo == "numero" and isinstance(valor, (int, float)):
+                    if math.isinf(valor):
+                        # igual que to_excel: los infinitos se escriben como texto
+                        worksheet.write_string(row, col_num, "inf" if valor > 0 else "-inf")
+                    else:
+                        worksheet.write_number(row, col_num, valor)
+                elif tipo == "fecha":
+                    worksheet.write_datetime(row, col_num, valor, fecha_format)
+                else:
+                    worksheet.write(row, col_num, valor)
+
+def tabla_arrow(df: pd.DataFrame, bank, account) -> pa.Table:
+    """
+    Convierte el resultado a una tabla de Arrow con el esquema fijo ESQUEMA_EDO_CTA; banco y cuenta van en los metadatos.
+    Los importes que no son numéricos quedan nulos (el resultado de asign_cve ya viene tipado, ver utils.tipar_edo_cta).
+    """
+    df = df[COLS_EDO_CTA].assign(**{col: pd.to_numeric(df[col], errors="coerce") for col in ['CARGO', 'ABONO', 'SALDO']})
+    tabla = pa.Table.from_pandas(df, schema=ESQUEMA_EDO_CTA, preserve_index=False)
+    # quitamos los metadatos de pandas para que el esquema sea siempre el mismo
+    return tabla.replace_schema_metadata({"banco": str(bank), "cuenta": str(account)})
+
+def export_to_parquet(df: pd.DataFrame, output_file, bank, account, perfil=SIN_PERFIL):
+    tabla = perfil.medir("tabla_arrow", tabla_arrow, df, bank, account)
+    perfil.medir("escritura", pq.write_table, tabla, output_file)
+
+def export_to_arrow(df: pd.DataFrame, output_file, bank, account, perfil=SIN_PERFIL):
+    # formato de archivo Arrow IPC (Feather v2), se lee con pyarrow.ipc.open_file o pandas.read_feather
+    tabla = perfil.medir("tabla_arrow", tabla_arrow, df, bank, account)
+    with pa.ipc.new_file(output_file, tabla.schema) as writer:
+        perfil.medir("escritura", writer.write_table, tabla)
+
+def export_to_csv(df: pd.DataFrame, output_file, bank, account, perfil=SIN_PERFIL):
+    # en csv las categorías se escriben como texto; la fecha conserva la hora, igual que en Parquet y Arrow
+    tabla = perfil.medir("tabla_arrow", tabla_arrow, df, bank, account)
+    esquema = pa.schema([(campo.name, pa.string() if campo.type == CATEGORIA else campo.type) for campo in tabla.schema])
+    perfil.medir("escritura", pa_csv.write_csv, tabla.cast(esquema), output_file)
+
+# formatos de exportación: función, extensión y tipo MIME para la descarga
+FORMATOS_EXPORTACION = {
+    'Excel': (export_to_excel, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'Parquet': (export_to_parquet, 'parquet', 'application/vnd.apache.parquet'),
+    'Arrow': (export_to_arrow, 'arrow', 'application/vnd.apache.arrow.file'),
+    'CSV': (export_to_csv, 'csv', 'text/csv'),
+}
@@ -0,0 +1,141 @@
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import MAX_MEMO_CLAVES
+
+# patrones de clave comunes a todos los bancos
+# pago a proveedor o acreedor "[T o G][10 dígitos]"
+PATRON_PAGO = r"([TG]\d{10})"
+# "[palabra clave][6 dígitos]", donde la palabra clave puede ser "TMLG", "NPRO" o "REEM"
+PATRON_TRASPASO = r"(TMLG|NPRO|REEM)(\d{6})"
+# nómina "[banco a tres letras][un dígito][dos letras]"
+PATRON_NOMINA = r"([A-Z]{3}\d[A-Z]{2})"
+
+class ExtractorClaves:
+    """
+    Extrae claves con una lista de patrones en orden de prioridad: gana la primera regla que coincide,
+    igual que aplicar re.search regla por regla.
+
+    Las reglas son tuplas (nombre, patrón), (nombre, patrón, texto requerido) o (nombre, patrón, texto requerido, transformación);
+    una regla con texto requerido solo aplica si ese texto aparece en la cadena (p. ej. "NOM ") y una regla con
+    transformación (p. ej. str.upper) se evalúa sobre el texto transformado, como hacer re.search(patrón, f(texto)).
+    La clave es la concatenación de los grupos del patrón, o la coincidencia completa si no tiene grupos.
+
+    Los estados de cuenta repiten mucho las mismas descripciones (comisiones, IVA, nómina...), así que `extraer`
+    evalúa las reglas una sola vez por texto distinto y recuerda el resultado de hasta `max_memo` textos
+    entre llamadas (p. ej. entre bloques o archivos), descartando los menos usados.
+    `filas` y `calculadas` cuentan las filas recibidas y los textos que sí se evaluaron; ver `tasa_aciertos`.
+    Los extractores son globales de cada módulo de banco y las sesiones de Streamlit son hilos del mismo proceso:
+    la memoria y los contadores se modifican con un candado, y los contadores suman todas las sesiones del proceso.
+    """
+    def __init__(self, reglas, max_memo: int = MAX_MEMO_CLAVES):
+        self.nombres = [regla[0] for regla in reglas]
+        self.patrones = [re.compile(regla[1]) for regla in reglas]
+        self.requeridos = [regla[2] if len(regla) > 2 else None for regla in reglas]
+        self.transformaciones = [regla[3] if len(regla) > 3 else None for regla in reglas]
+        self.max_memo = max_memo
+        self.memo = OrderedDict()
+        self.filas = 0
+        self.calculadas = 0
+        self._candado = threading.Lock()
+
+    def tasa_aciertos(self) -> float:
+        """Fracción de filas cuya clave no se tuvo que evaluar (texto repetido o recordado); None si no ha procesado filas."""
+        return 1 - self.calculadas / self.filas if self.filas else None
+
+    def reiniciar_estadisticas(self):
+        with self._candado:
+            self.filas = 0
+            self.calculadas = 0
+
+    def _clave(self, m):
+        return "".join(m.groups()) if m.re.groups > 1 else m.group(m.re.groups)
+
+    def buscar(self, texto: str, deshabilitadas=()):
+        """Devuelve (nombre, clave) de la primera regla que coincide con el texto, o (None, None)."""
+        for nombre, patron, requerido, transformacion in zip(self.nombres, self.patrones, self.requeridos, self.transformaciones):
+            if nombre in deshabilitadas:
+                continue
+            texto_regla = transformacion(texto) if transformacion is not None else texto
+            if requerido is not None and requerido not in texto_regla:
+                continue
+            m = patron.search(texto_regla)
+            if m:
+                return nombre, self._clave(m)
+        return None, None
+
+    def extraer(self, serie: pd.Series, deshabilitadas: dict = None) -> pd.DataFrame:
+        """
+        Aplica las reglas a toda la serie y devuelve un DataFrame con las columnas
+        "regla" (nombre de la regla ganadora o None) y "clave" (NaN si ninguna regla coincide).
+        `deshabilitadas` es un diccionario {nombre de regla: máscara booleana} con las filas donde la regla no aplica.
+        Las reglas se evalúan una vez por combinación distinta de texto y reglas deshabilitadas
+        (y solo para las que no están en la memoria); el resultado se reparte a todas sus filas.
+        """
+        deshabilitadas = deshabilitadas or {}
+        textos = serie.to_numpy(dtype=object)
+        codigos, _ = pd.factorize(textos, use_na_sentinel=False)
+        # las reglas deshabilitadas de cada fila, como bits, forman parte de la llave
+        bits = np.zeros(len(textos), dtype=np.int64)
+        for i, nombre in enumerate(self.nombres):
+            if nombre in deshabilitadas:
+                bits |= np.asarray(deshabilitadas[nombre], dtype=bool).astype(np.int64) << i
+        if bits.any():
+            codigos, _ = pd.factorize(codigos.astype(np.int64) * (1 << len(self.nombres)) + bits)
+        # primera fila de cada combinación distinta
+        n_unicas = codigos.max() + 1 if len(codigos) else 0
+        primeras = np.empty(n_unicas, dtype=np.int64)
+        primeras[codigos[::-1]] = np.arange(len(codigos) - 1, -1, -1)
+        llaves = list(zip(textos[primeras], bits[primeras]))
+
+        regla = np.full(n_unicas, None, dtype=object)
+        clave = np.full(n_unicas, np.nan, dtype=object)
+        faltantes = []
+        with self._candado:
+            for i, llave in enumerate(llaves):
+                resultado = self.memo.get(llave)
+                if resultado is None:
+                    faltantes.append(i)
+                else:
+                    self.memo.move_to_end(llave)
+                    regla[i], clave[i] = resultado
+        # las reglas se evalúan fuera del candado para no detener a las otras sesiones
+        if faltantes:
+            faltantes = np.array(faltantes)
+            regla[faltantes], clave[faltantes] = self._evaluar(textos[primeras[faltantes]], bits[primeras[faltantes]])
+        with self._candado:
+            if self.max_memo:
+                for i in faltantes:
+                    self.memo[llaves[i]] = (regla[i], clave[i])
+                while len(self.memo) > self.max_memo:
+                    self.memo.popitem(last=False)
+            self.filas += len(textos)
+            self.calculadas += len(faltantes)
+        return pd.DataFrame({"regla": regla[codigos], "clave": clave[codigos]}, index=serie.index)
+
+    def _evaluar(self, textos: np.ndarray, bits: np.ndarray) -> tuple:
+        """
+        Evalúa la cascada de reglas sobre un arreglo de textos; `bits` indica las reglas deshabilitadas de cada texto.
+        Cada regla solo recorre los textos que siguen sin clave: un texto deja de revisarse en cuanto una regla coincide.
+        """
+        regla = np.full(len(textos), None, dtype=object)
+        clave = np.full(len(textos), np.nan, dtype=object)
+        pendientes = np.ones(len(textos), dtype=bool)
+        reglas = zip(self.nombres, self.patrones, self.requeridos, self.transformaciones)
+        for i, (nombre, patron, requerido, transformacion) in enumerate(reglas):
+            filas = np.flatnonzero(pendientes & ((bits >> i) & 1 == 0))
+            textos_regla = textos[filas]
+            if transformacion is not None:
+                textos_regla = np.array([transformacion(texto) for texto in textos_regla], dtype=object)
+            if requerido is not None:
+                con_requerido = np.array([requerido in texto for texto in textos_regla], dtype=bool)
+                filas, textos_regla = filas[con_requerido], textos_regla[con_requerido]
+            coincidencias = [patron.search(texto) for texto in textos_regla]
+            for fila, m in zip(filas, coincidencias):
+                if m:
+                    regla[fila] = nombre
+                    clave[fila] = self._clave(m)
+                    pendientes[fila] = False
+        return regla, clave
@@ -1,18 +1,100 @@
 import pandas as pd
 import numpy as np
 import re
+import importlib.util
+from config import MOTOR_EXCEL_HSBC
+from utils import asignar_pendientes, ErrorEdoCta, tipar_edo_cta
+from extractor import ExtractorClaves, PATRON_PAGO, PATRON_TRASPASO, PATRON_NOMINA
 
-def preprocess_hsbc(uploaded_file)->pd.DataFrame:
+# columnas del xlsx de HSBC que se usan; las de texto se leen como str para no perder ceros a la izquierda
+COLS_HSBC = ["Fecha del apunte", "Descripción", "Referencia de cliente", "Referencia bancaria",
+             "Importe del débito", "Importe de crédito", "Saldo"]
+DTYPES_HSBC = {"Descripción": str, "Referencia de cliente": str, "Referencia bancaria": str}
+MOTORES_EXCEL_HSBC = ["calamine", "openpyxl_rapido", "openpyxl"]
+
+def motor_excel_hsbc(motor:str=None)->str:
+    """Lector a usar: el indicado, config.MOTOR_EXCEL_HSBC o, si ninguno, calamine cuando está instalado y si no openpyxl_rapido."""
+    motor = motor or MOTOR_EXCEL_HSBC
+    if motor is None:
+        motor = "calamine" if importlib.util.find_spec("python_calamine") is not None else "openpyxl_rapido"
+    if motor not in MOTORES_EXCEL_HSBC:
+        raise ValueError(f"Lector de Excel no soportado: {motor}")
+    return motor
+
+def _texto_celda(valor):
+    # igual que pd.read_excel con dtype=str: los números enteros sin ".0" y las celdas vacías como NaN
+    if valor is None:
+        return np.nan
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def leer_xlsx_openpyxl(uploaded_file, columnas:list, dtype:dict)->pd.DataFrame:
+    """
+    Lee la primera hoja con openpyxl en modo de solo lectura, tomando solo los valores (sin objetos de celda)
+    de las `columnas` indicadas; como en pd.read_excel, se quitan las filas vacías del final.
+    Las columnas de `dtype` quedan como texto y el resto con el tipo que se infiere de sus valores.
+    """
+    import openpyxl
+    libro = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = [str(valor) if valor is not None else None for valor in next(filas, ())]
+        faltantes = [col for col in columnas if col not in encabezado]
+        if faltantes:
+            raise ErrorEdoCta(f"El archivo de HSBC no tiene las columnas: {', '.join(faltantes)}")
+        posiciones = [encabezado.index(col) for col in columnas]
+        valores, filas_con_datos = [], 0
+        for fila in filas:
+            valores.append([fila[i] if i < len(fila) else None for i in posiciones])
+            if any(valor is not None and valor != "" for valor in fila):
+                filas_con_datos = len(valores)
+        del valores[filas_con_datos:]
+    finally:
+        libro.close()
+    df = pd.DataFrame(valores, columns=columnas, dtype=object)
+    for col in columnas:
+        if col in dtype:
+            df[col] = df[col].map(_texto_celda).astype(object)
+        else:
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                df[col] = df[col].infer_objects()
+    return df
+
+def leer_xlsx_hsbc(uploaded_file, motor:str=None)->pd.DataFrame:
+    """Lee las columnas COLS_HSBC del xlsx de HSBC con el lector elegido (ver `motor_excel_hsbc`); todos regresan el mismo DataFrame."""
+    motor = motor_excel_hsbc(motor)
+    if motor == "openpyxl_rapido":
+        return leer_xlsx_openpyxl(uploaded_file, COLS_HSBC, DTYPES_HSBC)
+    try:
+        return pd.read_excel(uploaded_file, header=0, engine=motor, usecols=COLS_HSBC, dtype=DTYPES_HSBC)
+    except ValueError as e:
+        if "Usecols" in str(e) or "usecols" in str(e):
+            raise ErrorEdoCta(f"El archivo de HSBC no tiene las columnas esperadas: {e}") from e
+        raise
+
+def preprocess_hsbc(uploaded_file, motor:str=None)->pd.DataFrame:
     # para HSBC, se recibe como .xlsx
-    df = pd.read_excel(uploaded_file, header=0, engine="openpyxl")
-    # Descripción, Referencia de cliente y Referencia bancaria son columnas que contienen valores numéricos
-    # convertimos las columnas "Descripción", "Referencia de cliente" y "Referencia bancaria" a tipo string
+    df = leer_xlsx_hsbc(uploaded_file, motor)
+    # Descripción, Referencia de cliente y Referencia bancaria se leen como texto
+    # (las celdas vacías quedan como "nan", igual que antes) y las referencias sin espacios
     df["Descripción"] = df["Descripción"].astype(str)
     df["Referencia de cliente"] = df["Referencia de cliente"].astype(str).str.replace(" ", "", regex=False)
     df["Referencia bancaria"] = df["Referencia bancaria"].astype(str).str.replace(" ", "", regex=False)
+    # la fecha se interpreta una sola vez; las claves por fecha y el formato parten de esta columna
+    if not pd.api.types.is_datetime64_any_dtype(df["Fecha del apunte"]):
+        df["Fecha del apunte"] = pd.to_datetime(df["Fecha del apunte"], format="%d/%m/%Y", errors="raise")
 
     return df
 
+def fecha_texto(fechas:pd.Series, formato:str)->pd.Series:
+    """Fecha como texto con `formato` (strftime); se formatea una vez por fecha distinta, no por fila."""
+    codigos, unicas = pd.factorize(fechas)
+    textos = np.append(pd.DatetimeIndex(unicas).strftime(formato).to_numpy(dtype=object), np.nan)
+    return pd.Series(textos[codigos], index=fechas.index, dtype=object)
+
 def asign_cve_hsbc(row):
     descripcion = row["Descripción"]
     ref_cliente = row["Referencia de cliente"]
@@ -54,14 +136,13 @@ def asign_cve_hsbc(row):
     elif re.search(r"A2000\d{5}", ref_cliente):
         match = re.search(r"A2000(\d{5})", ref_cliente)
         if match:
-            cve = match.group(1)+ ref_banc + "_" + str(row["Fecha del apunte"]).replace("/", "")
+            cve = match.group(1)+ ref_banc + "_" + row["Fecha del apunte"].strftime("%d%m%Y")
     # si el movimiento tiene referencia 5203 y en la descripción hay "ABONO POR CARTERA REMANENTE",
     # cve es la palabra siguiente seguida de la fecha a 6 dígitos
     elif ref_banc=='5203'and 'ABONO POR CARTERA REMANENTE' in descripcion:
         match = re.search(r"ABONO POR CARTERA REMANENTE ([A-Z]+)", descripcion)
         if match:
-            d,m,y = str(row['Fecha del apunte']).split('/')
-            cve = match.group(1)+d+m+y[-2:]
+            cve = match.group(1)+row['Fecha del apunte'].strftime("%d%m%y")
         else: return ref_cliente
     # si en la referencia de cliente aparece "D[5 dígitos]", cve es este patrón
     elif re.search(r"D\d{5}", ref_cliente):
@@ -76,6 +157,78 @@ def asign_cve_hsbc(row):
         cve += "_"+descripcion.split("NETNM ")[1].replace(" ", "_")
     return cve
 
+# reglas de clave de HSBC sobre la descripción, en orden de prioridad
+EXTRACTOR_HSBC = ExtractorClaves([
+    ("pago", PATRON_PAGO),
+    ("traspaso", PATRON_TRASPASO),
+    ("nomina", PATRON_NOMINA, "NOM "),
+])
+
+def asign_cve_hsbc_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_hsbc`: evalúa la cascada de reglas por columnas, en el mismo orden de prioridad."""
+    descripcion = edo_cta["Descripción"]
+    ref_cliente = edo_cta["Referencia de cliente"]
+    ref_banc = edo_cta["Referencia bancaria"]
+    fecha = edo_cta["Fecha del apunte"]
+    # las claves de pago, traspaso y nómina no aplican para las referencias bancarias de comisiones
+    elegibles = ~ref_banc.isin(['1661', '1725', '1609'])
+    cve = pd.Series(np.nan, index=edo_cta.index, dtype=object)
+    cve[elegibles] = EXTRACTOR_HSBC.extraer(descripcion[elegibles])["clave"]
+    #___________________________________________________________________________________________________________
+    # el resto de las filas (incluidas las de comisiones) se resuelven con las referencias
+    pendientes = cve.isna()
+    # el sufijo NETNM aplica a todas estas filas, salvo la cartera remanente sin palabra
+    netnm = pendientes & descripcion.str.contains("NETNM ", regex=False)
+    # IVA: "IVA_" + referencia de cliente
+    iva = pendientes & (ref_banc == '1501')
+    pendientes = asignar_pendientes(cve, pendientes, "IVA_" + ref_cliente[iva])
+    # comisiones: "COM_" + referencia de cliente
+    com = pendientes & ref_banc.isin(['1661', '1725', '1609', '1523'])
+    pendientes = asignar_pendientes(cve, pendientes, "COM_" + ref_cliente[com])
+    # "A2000[5 dígitos]" en la referencia de cliente: los 5 dígitos, la referencia bancaria y la fecha
+    valores = ref_cliente[pendientes].str.extract(r"A2000(\d{5})", expand=False).dropna()
+    valores = valores + ref_banc[valores.index] + "_" + fecha_texto(fecha[valores.index], "%d%m%Y")
+    pendientes = asignar_pendientes(cve, pendientes, valores)
+    # "ABONO POR CARTERA REMANENTE [palabra]" con referencia 5203: la palabra y la fecha a 6 dígitos
+    # si no se encuentra la palabra, la clave es la referencia de cliente
+    cartera = pendientes & (ref_banc == '5203') & descripcion.str.contains('ABONO POR CARTERA REMANENTE', regex=False)
+    if cartera.any():
+        palabra = descripcion[cartera].str.extract(r"ABONO POR CARTERA REMANENTE ([A-Z]+)", expand=False)
+        valores = (palabra + fecha_texto(fecha[cartera], "%d%m%y")).fillna(ref_cliente[cartera])
+        netnm[palabra.index[palabra.isna()]] = False
+        pendientes = asignar_pendientes(cve, pendientes, valores, resueltas=valores.index)
+    # "D[5 dígitos]" en la referencia de cliente
+    valores = ref_cliente[pendientes].str.extract(r"D(\d{5})", expand=False)
+    pendientes = asignar_pendientes(cve, pendientes, 'D' + valores)
+    # en otro caso, la referencia de cliente sin comillas simples
+    valores = ref_cliente[pendientes].str.replace("'", "", regex=False)
+    asignar_pendientes(cve, pendientes, valores, resueltas=valores.index)
+    # si en la descripción aparece "NETNM ", agregar "_[texto posterior a NETNM sin espacios]"
+    cve[netnm] = cve[netnm] + "_" + descripcion[netnm].str.split("NETNM ", regex=False).str[1].str.replace(" ", "_", regex=False)
+    return cve
+
+def consolidar_hsbc(edo_cta:pd.DataFrame)->pd.DataFrame:
+    # agrupamos todos los abonos fipp (referencia bancaria '5203' y 'ABONO FIPP' en la descripción) por día (fecha del apunte)
+    # sumamos sus importes y sustituimos a todos estos movimientos por uno solo asignando la clave FIPP_[fecha]
+    # hacemos lo mismo con los créditos (referencia bancaria '1065'), asignando la clave "CRE_[fecha]"
+    descripcion = edo_cta['Descripción']
+    es_fipp = edo_cta["Referencia bancaria"].isin(['1065','5203']) \
+        & (descripcion.str.contains("ABONO FIPP", regex=False) | descripcion.str.contains("CARGO CREDITO", regex=False))
+    if not es_fipp.any():
+        return edo_cta
+    grupos = edo_cta[es_fipp].groupby(["Referencia bancaria", "Fecha del apunte"]) \
+        .agg({"Importe de crédito": "sum","Importe del débito": "sum"}).reset_index()
+    # los grupos de '1065' son créditos y los de '5203' fipps; la clave es el prefijo y la fecha ddmmaaaa
+    grupos = grupos[grupos["Referencia bancaria"].isin(['5203', '1065'])]
+    prefijo = np.where(grupos["Referencia bancaria"] == "5203", "FIPP_", "CRE_")
+    grupos["cve"] = prefijo + fecha_texto(grupos["Fecha del apunte"], "%d%m%Y")
+    # primero los fipps y después los créditos, cada uno en el orden de la fecha como texto dd/mm/aaaa
+    # (como viene en el archivo), que es el orden en que se agrupaban antes de interpretar la fecha
+    grupos["orden"] = fecha_texto(grupos["Fecha del apunte"], "%d/%m/%Y")
+    grupos = grupos.sort_values(["Referencia bancaria", "orden"], ascending=[False, True], kind="stable").drop(columns="orden")
+    # sustituimos los movimientos originales por los agrupados
+    return pd.concat([edo_cta[~es_fipp], grupos], ignore_index=True)
+
 def format_hsbc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     # formateamos el DataFrame para que tenga las columnas necesarias
     # y renombramos las columnas
@@ -93,8 +246,7 @@ def format_hsbc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["ABONO"] = edo_cta["ABONO"].fillna(0)
     # para cargo tomamos el valor absoluto del importe del débito
     edo_cta["CARGO"] = np.abs(edo_cta["CARGO"].fillna(0))
-    # convertimos la columna "Fecha" a tipo datetime
-    edo_cta["FECHA"] = pd.to_datetime(edo_cta["FECHA"], format="%d/%m/%Y", errors="raise")
+    # la columna "FECHA" ya es datetime (preprocess_hsbc)
     # convertimos la columna "Descripción" a tipo string
     edo_cta["DESCRIPCIÓN"] = edo_cta["DESCRIPCIÓN"].astype(str)
     # asignamos una columna de "BANCO" con el nombre del banco
@@ -104,4 +256,5 @@ def format_hsbc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["CONCEPTO"] = "#"
     edo_cta["BENEFICIARIO"] = "#"
 
-    return edo_cta
\ No newline at end of file
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
\ No newline at end of file
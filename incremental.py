@@ -0,0 +1,140 @@
+"""
+Procesamiento incremental: guarda por banco y cuenta los movimientos ya procesados, identificados por la huella
+de la fila leída del archivo, para que al volver a subir un estado de cuenta (p. ej. el del mes en curso, que se
+sube cada día) solo se asignen claves, formato y tipo de movimiento a los movimientos nuevos.
+
+    almacen = AlmacenIncremental("Banamex", "828", bnx.huella_bnx)
+    df = almacen.procesar(edo_cta_leido, procesar)
+    almacen.guardar()
+
+La huella es el hash de la cuenta y de los campos que da la función `huella_<banco>` de cada banco para la fila leída:
+fecha, importe, saldo y el texto de la fila (descripción, referencias...), con tipos fijos (utils.campos_huella)
+para que no dependa de cómo se partió el archivo en bloques; cualquier cambio en esos campos la hace un movimiento nuevo.
+Hay un archivo por banco, cuenta y versión de reglas (cache.version_reglas): si cambian las reglas se empieza
+de cero y el archivo anterior se borra al guardar.
+Solo sirve para los bancos cuyo resultado se calcula fila por fila; los que consolidan movimientos (HSBC) no tienen
+`huella_<banco>` y se procesan completos.
+"""
+import os
+import re
+import tempfile
+import numpy as np
+import pandas as pd
+from config import DIR_INCREMENTAL, MAX_FILAS_INCREMENTAL
+from cache import version_reglas
+from utils import avisar, tipar_edo_cta, concatenar_edo_cta
+
+def huellas_movimientos(campos: pd.DataFrame, cta: str) -> np.ndarray:
+    """Hash (uint64) de cada movimiento con la cuenta y sus campos de huella (utils.campos_huella), sin el índice."""
+    return pd.util.hash_pandas_object(campos.assign(CUENTA=str(cta)), index=False).to_numpy()
+
+def nombre_almacen(bank: str, cta: str) -> str:
+    return f"{bank}_{cta}".replace(" ", "_").replace("(", "").replace(")", "")
+
+class AlmacenIncremental:
+    """
+    Movimientos ya procesados de una cuenta: el resultado de asign_cve de cada fila con su huella en la columna "HUELLA".
+    `filas` y `reutilizadas` cuentan las filas recibidas en `procesar` y las que se tomaron del almacén.
+    Si dos procesos guardan a la vez el almacén de la misma cuenta gana el último; las filas del otro
+    simplemente se vuelven a procesar la siguiente vez.
+    """
+    def __init__(self, bank: str, cta: str, huella, carpeta: str = DIR_INCREMENTAL, max_filas: int = MAX_FILAS_INCREMENTAL):
+        self.cta = cta
+        self.huella = huella
+        self.carpeta = carpeta
+        self.nombre = nombre_almacen(bank, cta)
+        self.ruta = os.path.join(carpeta, f"{self.nombre}_{version_reglas()}.parquet")
+        self.max_filas = max_filas
+        self.previos = self._leer()
+        self.indice = pd.Index(self.previos["HUELLA"]) if self.previos is not None else pd.Index([], dtype=np.uint64)
+        self.nuevos = []
+        self.filas = 0
+        self.reutilizadas = 0
+
+    def _leer(self) -> pd.DataFrame:
+        if not os.path.exists(self.ruta):
+            return None
+        try:
+            previos = pd.read_parquet(self.ruta)
+        except Exception as e:
+            # archivo dañado: se descarta y los movimientos se vuelven a procesar
+            avisar(f"No se pudo leer el almacén incremental {self.ruta}, los movimientos se vuelven a procesar: {e}")
+            try:
+                os.remove(self.ruta)
+            except FileNotFoundError:
+                # otro proceso ya lo eliminó
+                pass
+            return None
+        return tipar_edo_cta(previos)
+
+    def procesar(self, edo_cta: pd.DataFrame, procesar) -> pd.DataFrame:
+        """
+        Regresa el resultado de `procesar(edo_cta)` (claves, formato y postproceso de un DataFrame leído),
+        llamando a `procesar` solo con las filas cuya huella no está en el almacén; el resto se toma del almacén.
+        Las filas quedan en el orden del archivo. Si ninguna fila está en el almacén el resultado es el de `procesar` tal cual.
+        """
+        huellas = huellas_movimientos(self.huella(edo_cta), self.cta)
+        posiciones = self.indice.get_indexer(huellas)
+        vistos = posiciones >= 0
+        self.filas += len(edo_cta)
+        self.reutilizadas += int(vistos.sum())
+        if not vistos.any():
+            resultado = procesar(edo_cta)
+            self._agregar(resultado, huellas)
+            return resultado
+
+        partes = [self.previos.iloc[posiciones[vistos]].drop(columns="HUELLA")]
+        orden = [np.flatnonzero(vistos)]
+        if not vistos.all():
+            nuevos = procesar(edo_cta[~vistos].copy())
+            self._agregar(nuevos, huellas[~vistos])
+            partes.append(nuevos)
+            orden.append(np.flatnonzero(~vistos))
+        resultado = concatenar_edo_cta(partes)
+        return resultado.take(np.argsort(np.concatenate(orden), kind="stable")).reset_index(drop=True)
+
+    def _agregar(self, resultado: pd.DataFrame, huellas: np.ndarray):
+        if len(resultado) != len(huellas):
+            raise ValueError("El procesamiento incremental requiere una fila de resultado por fila leída")
+        self.nuevos.append(resultado.assign(HUELLA=huellas))
+
+    def guardar(self):
+        """
+        Agrega los movimientos nuevos al almacén (si una huella se repite queda la última) y conserva
+        como máximo `max_filas` filas, descartando las más antiguas; borra los almacenes de otras versiones de reglas.
+        """
+        if not self.nuevos:
+            return
+        partes = ([self.previos] if self.previos is not None else []) + self.nuevos
+        todos = concatenar_edo_cta(partes).drop_duplicates("HUELLA", keep="last")
+        if self.max_filas and len(todos) > self.max_filas:
+            todos = todos.iloc[-self.max_filas:]
+        os.makedirs(self.carpeta, exist_ok=True)
+        # escribimos a un temporal propio de esta escritura (otras sesiones pueden guardar la misma cuenta a la vez)
+        # y lo renombramos para que nunca quede un archivo a medias
+        descriptor, temporal = tempfile.mkstemp(dir=self.carpeta, suffix=".tmp")
+        os.close(descriptor)
+        try:
+            todos.to_parquet(temporal, index=False)
+            os.replace(temporal, self.ruta)
+        except Exception:
+            try:
+                os.remove(temporal)
+            except FileNotFoundError:
+                pass
+            raise
+        patron = re.compile(re.escape(self.nombre) + r"_[0-9a-f]{16}\.parquet")
+        for entrada in os.scandir(self.carpeta):
+            if patron.fullmatch(entrada.name) and entrada.path != self.ruta:
+                try:
+                    os.remove(entrada.path)
+                except FileNotFoundError:
+                    # otra sesión ya lo eliminó
+                    pass
+        self.previos = todos.reset_index(drop=True)
+        self.indice = pd.Index(self.previos["HUELLA"])
+        self.nuevos = []
+
+    def tasa_reutilizadas(self) -> float:
+        """Fracción de filas tomadas del almacén; None si no ha procesado filas."""
+        return self.reutilizadas / self.filas if self.filas else None
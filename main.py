@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import io
-from config import CUENTAS, TYPES_EDO_CTA
-from cves import asign_cve
-from export import export_to_excel
+from config import CUENTAS, TYPES_EDO_CTA, FILAS_POR_BLOQUE
+from paralelo import procesar_archivos, concatenar_resultados
+from export import FORMATOS_EXPORTACION
+from perfil import Perfil
+from almacen import guardar_movimientos
+from validacion import validar_edo_cta, hay_problemas
+from cves import resumen_reglas_tipo
 
 st.title("Asignador de Claves de Estado de Cuenta")
 
@@ -11,10 +15,50 @@ st.title("Asignador de Claves de Estado de Cuenta")
 bank = st.sidebar.selectbox("Selecciona banco", list(CUENTAS.keys()))
 cuentas = CUENTAS[bank]
 account = st.sidebar.selectbox("Selecciona cuenta", cuentas)
+# medición por etapa (tiempo y filas); hace más lento el procesamiento y no usa el caché
+perfilar = st.sidebar.checkbox("Medir etapas")
+# tracemalloc es global al proceso: mientras mide, hace más lentas las demás sesiones del servidor
+memoria = st.sidebar.checkbox("Incluir memoria por etapa", disabled=not perfilar,
+                              help="Hace más lento el procesamiento de todas las sesiones mientras se mide")
+cprofile = st.sidebar.checkbox("Incluir cProfile de la etapa más lenta", disabled=not perfilar)
+# los movimientos ya procesados de la cuenta se toman del almacén incremental y solo se procesan los nuevos
+incremental = st.sidebar.checkbox("Procesamiento incremental", help="Para estados de cuenta que se vuelven a subir con movimientos nuevos (p. ej. el del mes en curso)")
+# los movimientos procesados se guardan en el almacén local para consultarlos en la página "Consultar"
+guardar = st.sidebar.checkbox("Guardar en el almacén", value=True)
 
 def load_file(uploaded_file):
     return uploaded_file
 
+@st.cache_data(max_entries=20, show_spinner=False)
+def exportar(llaves: tuple, bank: str, account: str, formato: str, perfilar: bool, memoria: bool, _df: pd.DataFrame) -> tuple:
+    # el archivo depende solo de los archivos procesados (sus llaves de caché), el banco, la cuenta y el formato;
+    # el DataFrame no se hashea para no recorrerlo en cada interacción
+    # regresa el archivo y, con perfilar, la medición de la exportación (la de cuando se generó el archivo)
+    output = io.BytesIO()
+    exportar_formato = FORMATOS_EXPORTACION[formato][0]
+    if not perfilar:
+        exportar_formato(df=_df, output_file=output, bank=bank, account=account)
+        return output.getvalue(), None
+    with Perfil(memoria=memoria) as perfil:
+        exportar_formato(df=_df, output_file=output, bank=bank, account=account, perfil=perfil)
+    return output.getvalue(), perfil.como_dict()
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def guardar_almacen(llaves: tuple, _dfs: list) -> int:
+    # igual que en exportar, se guarda una sola vez por conjunto de archivos procesados y no en cada interacción;
+    # cada archivo se guarda por separado para que los movimientos que se repiten entre dos estados de cuenta
+    # que se traslapan no se tomen como repeticiones dentro de uno solo
+    return sum(guardar_movimientos(df) for df in _dfs)
+
+def mostrar_perfil(titulo: str, medicion: dict):
+    st.markdown(f"**{titulo}**")
+    st.dataframe(pd.DataFrame(medicion["etapas"]), hide_index=True)
+    if medicion.get("aviso"):
+        st.caption(medicion["aviso"])
+    if medicion["cprofile"]:
+        st.caption(f"cProfile de la etapa más lenta: {medicion['etapa_cprofile']}")
+        st.code(medicion["cprofile"])
+
 uploaded_files = st.file_uploader(
     "Arrastra uno o más archivos de estados de cuenta",
     type=TYPES_EDO_CTA[bank],
@@ -22,23 +66,60 @@ uploaded_files = st.file_uploader(
 )
 
 if uploaded_files:
-    dfs = []
-    for f in uploaded_files:
-        # guarda temporal
-        df = asign_cve(f, bank, account)
-        dfs.append(df)
-    result = pd.concat(dfs, ignore_index=True)
+    # se pasan los bytes de cada archivo (no el objeto de Streamlit) para poder procesarlos en otros procesos
+    archivos = [(f.name, f.getvalue()) for f in uploaded_files]
+    # los csv grandes se procesan por bloques para no cargar el archivo completo en memoria
+    resultados = procesar_archivos(archivos, bank, account, chunksize=FILAS_POR_BLOQUE, perfilar=perfilar, cprofile=cprofile,
+                                   memoria=perfilar and memoria, incremental=incremental)
+    for resultado in resultados:
+        for aviso in resultado["avisos"]:
+            st.warning(f"{resultado['nombre']}: {aviso}")
+        if resultado["error"] is not None:
+            st.error(f"Error al procesar {resultado['nombre']}: {resultado['error'].splitlines()[0]}")
+            with st.expander(f"Detalle del error en {resultado['nombre']}"):
+                st.code(resultado["error"])
+    result = concatenar_resultados(resultados)
+    if result is None:
+        st.stop()
     exp_file_name = "claves_"+uploaded_files[0].name.split(".")[0]
 
-    # Guardar Excel en memoria
-    output = io.BytesIO()
-    export_to_excel(df=result, output_file=output, bank=bank, account=account)
-    output.seek(0)  # mover el puntero al inicio del archivo
+    # Guardar el archivo en memoria (solo se regenera si cambian los archivos, el banco, la cuenta o el formato)
+    formato = st.selectbox("Formato de descarga", list(FORMATOS_EXPORTACION.keys()))
+    _, extension, mime = FORMATOS_EXPORTACION[formato]
+    llaves = tuple(resultado["llave"] for resultado in resultados if resultado["error"] is None)
+    output, perfil_exportacion = exportar(llaves, bank, account, formato, perfilar, perfilar and memoria, result)
+    if guardar:
+        dfs = [resultado["df"] for resultado in resultados if resultado["error"] is None]
+        st.caption(f"Movimientos nuevos en el almacén: {guardar_almacen(llaves, dfs)}")
+
+    if perfilar:
+        with st.expander("Tiempos por etapa"):
+            for resultado in resultados:
+                if resultado["perfil"] is not None:
+                    mostrar_perfil(f"{resultado['nombre']} ({resultado['segundos']:.2f} s)", resultado["perfil"])
+            if perfil_exportacion is not None:
+                mostrar_perfil(f"Exportación a {formato}", perfil_exportacion)
+
+    # filas que clasificó cada regla de tipo de movimiento, sumando todos los archivos
+    with st.expander("Reglas de tipo de movimiento"):
+        reglas = resumen_reglas_tipo(resultado["reglas_tipo"] for resultado in resultados)
+        st.dataframe(reglas[reglas["FILAS"] > 0].sort_values("FILAS", ascending=False), hide_index=True)
+
+    # continuidad del saldo, movimientos duplicados y movimientos sin importe de todos los archivos
+    reporte = validar_edo_cta(result)
+    if hay_problemas(reporte):
+        st.warning("La validación encontró rupturas de saldo, movimientos duplicados o movimientos sin importe; ver \"Validación\".")
+    with st.expander("Validación"):
+        st.dataframe(reporte["resumen"], hide_index=True)
+        for parte, titulo in [("rupturas", "Rupturas de saldo"), ("duplicados", "Movimientos duplicados"), ("sin_importe", "CARGO y ABONO en 0")]:
+            if len(reporte[parte]):
+                st.markdown(f"**{titulo}**")
+                st.dataframe(reporte[parte], hide_index=True)
 
     st.dataframe(result)
     st.download_button(
         "Descargar",
         data=output,
-        file_name=f"{exp_file_name}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        file_name=f"{exp_file_name}.{extension}",
+        mime=mime,
     )
\ No newline at end of file
@@ -0,0 +1,31 @@
+import streamlit as st
+from config import CUENTAS
+from almacen import consultar_movimientos, resumen_almacen
+
+# página de consulta del almacén de movimientos (almacen.py); Streamlit la agrega como página de main.py
+st.title("Consultar movimientos")
+
+with st.expander("Movimientos guardados por cuenta"):
+    st.dataframe(resumen_almacen(), hide_index=True)
+
+clave = st.text_input("Clave").strip()
+col_banco, col_cuenta = st.columns(2)
+banco = col_banco.selectbox("Banco", ["Todos"] + list(CUENTAS.keys()))
+cuenta = col_cuenta.selectbox("Cuenta", ["Todas"] + (CUENTAS[banco] if banco != "Todos" else []))
+tipo = st.text_input("Tipo de movimiento").strip().upper()
+col_inicio, col_fin = st.columns(2)
+fecha_inicio = col_inicio.date_input("Desde", value=None)
+fecha_fin = col_fin.date_input("Hasta", value=None)
+limite = st.number_input("Máximo de filas", min_value=1, value=10000, step=1000)
+
+movimientos = consultar_movimientos(
+    clave=clave or None,
+    banco=None if banco == "Todos" else banco,
+    cuenta=None if cuenta == "Todas" else cuenta,
+    tipo=tipo or None,
+    fecha_inicio=fecha_inicio,
+    fecha_fin=fecha_fin,
+    limite=int(limite),
+)
+st.caption(f"{len(movimientos)} movimientos")
+st.dataframe(movimientos)
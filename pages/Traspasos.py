@@ -0,0 +1,39 @@
+import datetime
+import streamlit as st
+from config import VENTANA_DIAS_TRASPASOS, MAX_MOVIMIENTOS_TRASPASOS
+from almacen import consultar_movimientos
+from traspasos import conciliar_traspasos, resumen_traspasos
+
+# página de conciliación de traspasos TMLG entre cuentas con los movimientos del almacén (almacen.py)
+st.title("Traspasos entre cuentas MLG")
+
+hoy = datetime.date.today()
+col_inicio, col_fin, col_ventana = st.columns(3)
+fecha_inicio = col_inicio.date_input("Desde", value=hoy.replace(day=1))
+fecha_fin = col_fin.date_input("Hasta", value=hoy)
+ventana = col_ventana.number_input("Días de diferencia", min_value=0, value=VENTANA_DIAS_TRASPASOS)
+
+# se leen también los días de la ventana antes y después para no dejar sin contraparte los traspasos de las orillas;
+# el tipo y las fechas se filtran en el almacén (con sus índices) y solo se leen las columnas de la conciliación
+margen = datetime.timedelta(days=int(ventana))
+movimientos = consultar_movimientos(tipo="TRASPASO ENTRE CUENTAS MLG", fecha_inicio=fecha_inicio - margen,
+                                    fecha_fin=fecha_fin + margen, limite=MAX_MOVIMIENTOS_TRASPASOS + 1,
+                                    columnas=["BANCO", "CUENTA", "FECHA", "DETALLE", "CARGO", "ABONO", "CLAVE"])
+if len(movimientos) > MAX_MOVIMIENTOS_TRASPASOS:
+    movimientos = movimientos.iloc[:MAX_MOVIMIENTOS_TRASPASOS]
+    st.warning(f"El periodo tiene más de {MAX_MOVIMIENTOS_TRASPASOS:,} traspasos; solo se concilian los que van hasta el "
+               f"{movimientos['FECHA'].iloc[-1]:%d-%m-%Y}. Elige un periodo más corto para conciliar el resto.")
+resultado = conciliar_traspasos(movimientos, int(ventana))
+# solo se reportan los movimientos (o pares, por la fecha de salida) del periodo elegido
+dentro = lambda fechas: (fechas.dt.date >= fecha_inicio) & (fechas.dt.date <= fecha_fin)
+resultado = {
+    "conciliados": resultado["conciliados"][dentro(resultado["conciliados"]["FECHA_SALIDA"])],
+    "ambiguos": resultado["ambiguos"][dentro(resultado["ambiguos"]["FECHA_SALIDA"])],
+    "sin_contraparte": resultado["sin_contraparte"][dentro(resultado["sin_contraparte"]["FECHA"])],
+}
+
+st.dataframe(resumen_traspasos(resultado), hide_index=True)
+for estado, titulo in [("conciliados", "Conciliados"), ("ambiguos", "Ambiguos (más de una contraparte posible)"),
+                       ("sin_contraparte", "Sin contraparte")]:
+    with st.expander(f"{titulo}: {len(resultado[estado])}"):
+        st.dataframe(resultado[estado], hide_index=True)
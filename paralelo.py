@@ -0,0 +1,93 @@
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from config import MAX_WORKERS, MIN_BYTES_PARALELO
+from cves import asign_cve_resultado
+from cache import llave_cache, leer_cache, guardar_cache
+from utils import concatenar_edo_cta
+
+def procesar_archivo(nombre: str, contenido: bytes, bank: str, cta: str, kwargs: dict) -> dict:
+    """
+    Procesa un solo estado de cuenta a partir de su contenido en bytes.
+    Nunca lanza excepción: el error se regresa en el resultado para no detener el resto del lote.
+    """
+    inicio = time.perf_counter()
+    resultado = asign_cve_resultado(io.BytesIO(contenido), bank, cta, **kwargs)
+    resultado["nombre"] = nombre
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+def procesar_archivos(archivos: list, bank: str, cta: str, max_workers: int = None, usar_cache: bool = True, **kwargs) -> list:
+    """
+    Ejecuta `asign_cve` sobre una lista de archivos (nombre, contenido en bytes) del mismo banco y cuenta.
+    Con varios archivos y suficiente volumen se usa un pool de procesos de hasta `max_workers` procesos
+    (por defecto config.MAX_WORKERS); con pocos datos se procesan en serie, porque arrancar los procesos
+    cuesta más que lo que se gana.
+    Con usar_cache, los archivos ya procesados con la misma versión de reglas se leen del caché en disco
+    y solo se procesan los demás.
+    Regresa un resultado por archivo, en el mismo orden de entrada, con las llaves "nombre", "df", "avisos", "error",
+    "perfil", "reglas_tipo" (filas por regla de tipo de movimiento, ver cves.resumen_reglas_tipo), "segundos",
+    "cache" (si vino del caché) y "llave" (llave de caché del archivo).
+    Los argumentos extra (p. ej. chunksize) se pasan a `asign_cve`; con perfilar=True no se lee el caché,
+    para que todos los archivos se procesen y se midan.
+    """
+    tareas = [(nombre, contenido, bank, cta) for nombre, contenido in archivos]
+    return procesar_tareas(tareas, max_workers, usar_cache, **kwargs)
+
+def procesar_tareas(tareas: list, max_workers: int = None, usar_cache: bool = True, **kwargs) -> list:
+    """
+    Igual que `procesar_archivos`, pero cada tarea (nombre, contenido, banco, cuenta) indica su propio banco y cuenta,
+    de modo que un mismo pool procesa estados de cuenta de distintos bancos.
+    """
+    resultados = [None] * len(tareas)
+    leer = usar_cache and not (kwargs.get("perfilar") or kwargs.get("cprofile"))
+    llaves = [llave_cache(contenido, bank, cta) for _, contenido, bank, cta in tareas]
+    pendientes = []
+    for i, (nombre, _, _, _) in enumerate(tareas):
+        df = leer_cache(llaves[i]) if leer else None
+        if df is not None:
+            avisos = df.attrs.pop("avisos", [])
+            reglas_tipo = df.attrs.pop("reglas_tipo", None)
+            resultados[i] = {"nombre": nombre, "df": df, "avisos": avisos, "error": None, "perfil": None,
+                             "reglas_tipo": reglas_tipo, "segundos": 0.0}
+        else:
+            pendientes.append(i)
+    procesados, aviso_lote = _procesar_lote([tareas[i] for i in pendientes], max_workers, kwargs)
+    for i, resultado in zip(pendientes, procesados):
+        if usar_cache and resultado["error"] is None:
+            guardar_cache(llaves[i], resultado["df"], resultado["avisos"], reglas_tipo=resultado["reglas_tipo"])
+        # el aviso del lote no es del archivo, así que no se guarda en el caché
+        if aviso_lote is not None:
+            resultado["avisos"].append(aviso_lote)
+        resultados[i] = resultado
+    for i, resultado in enumerate(resultados):
+        resultado["cache"] = i not in pendientes
+        resultado["llave"] = llaves[i]
+    return resultados
+
+def _procesar_lote(tareas: list, max_workers: int, kwargs: dict) -> tuple:
+    """
+    Procesa las tareas en el pool de procesos o en serie; regresa los resultados y el texto de un aviso
+    (como los de utils.avisar) si no se pudo usar el pool y se procesó en serie, o None.
+    """
+    max_workers = max_workers or MAX_WORKERS
+    total_bytes = sum(len(contenido) for _, contenido, _, _ in tareas)
+    if len(tareas) > 1 and max_workers > 1 and total_bytes >= MIN_BYTES_PARALELO:
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tareas))) as pool:
+                futuros = [pool.submit(procesar_archivo, *tarea, kwargs) for tarea in tareas]
+                return [futuro.result() for futuro in futuros], None
+        except (BrokenProcessPool, OSError) as e:
+            # si no se pueden levantar los procesos, procesamos en serie
+            aviso = f"No se pudo usar el pool de procesos ({e}); se procesó en serie."
+            return [procesar_archivo(*tarea, kwargs) for tarea in tareas], aviso
+    return [procesar_archivo(*tarea, kwargs) for tarea in tareas], None
+
+def concatenar_resultados(resultados: list) -> pd.DataFrame:
+    """Une en orden los DataFrames de los archivos que se procesaron sin error, conservando las categorías (utils.concatenar_edo_cta)."""
+    dfs = [resultado["df"] for resultado in resultados if resultado["error"] is None]
+    if not dfs:
+        return None
+    return concatenar_edo_cta(dfs)
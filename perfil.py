@@ -0,0 +1,143 @@
+"""
+Medición por etapa del procesamiento de un estado de cuenta: tiempo, filas de entrada y salida y, opcionalmente,
+el pico de memoria y el perfil de cProfile de la etapa más lenta.
+
+    with Perfil(cprofile=True) as perfil:
+        df = asign_cve(archivo, "Banamex", "828", perfil=perfil)
+    perfil.como_dict()
+
+Sin perfil se usa SIN_PERFIL, que solo llama a la función, de modo que el costo cuando no se mide es una llamada extra por etapa.
+"""
+import io
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import pandas as pd
+
+# cProfile y tracemalloc son globales al proceso: solo un perfil a la vez puede usarlos
+# (las sesiones de Streamlit son hilos del mismo proceso); los demás miden solo tiempo y filas
+_HERRAMIENTAS = threading.Lock()
+
+def _largo(valor):
+    return len(valor) if isinstance(valor, (pd.DataFrame, pd.Series)) else None
+
+class SinPerfil:
+    """Perfil desactivado: `medir` ejecuta la función sin registrar nada."""
+    activo = False
+
+    def medir(self, etapa: str, funcion, *args, filas_entrada: int = None, **kwargs):
+        return funcion(*args, **kwargs)
+
+SIN_PERFIL = SinPerfil()
+
+class Perfil(SinPerfil):
+    """
+    Registra cada etapa medida con `medir`. Si una etapa se mide varias veces (p. ej. una vez por bloque)
+    se acumulan el tiempo y las filas y se guarda el mayor pico de memoria.
+    Con memoria=True se usa tracemalloc, que hace más lento el procesamiento; el pico es la memoria
+    reservada por encima de la que había al iniciar la etapa. tracemalloc es global al proceso (en el servidor
+    de Streamlit afecta a todas las sesiones), por eso solo se activa cuando se pide.
+    Con cprofile=True cada medición se hace con cProfile y se conserva la de la medición más lenta.
+    Si otro perfil ya está usando cProfile o tracemalloc, este no los usa (no falla) y lo explica en `aviso`;
+    los toma en la primera medición y los libera con `detener`.
+    """
+    activo = True
+
+    def __init__(self, memoria: bool = False, cprofile: bool = False):
+        self.memoria = memoria
+        self.cprofile = cprofile
+        self.etapas = {}
+        self.aviso = None
+        self._herramientas = False
+        self._inicio_tracemalloc = False
+        self._mas_lento = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+        return False
+
+    def detener(self):
+        """Detiene tracemalloc si lo inició este perfil y libera cProfile y tracemalloc para otros perfiles."""
+        if self._inicio_tracemalloc:
+            tracemalloc.stop()
+            self._inicio_tracemalloc = False
+        if self._herramientas:
+            _HERRAMIENTAS.release()
+            self._herramientas = False
+
+
+    def medir(self, etapa: str, funcion, *args, filas_entrada: int = None, **kwargs):
+        """Ejecuta funcion(*args, **kwargs) registrando la etapa; las filas de entrada se toman del primer argumento si es un DataFrame o Series."""
+        if filas_entrada is None and args:
+            filas_entrada = _largo(args[0])
+        if (self.memoria or self.cprofile) and not self._herramientas:
+            if _HERRAMIENTAS.acquire(blocking=False):
+                self._herramientas = True
+            else:
+                self.memoria = self.cprofile = False
+                self.aviso = "No se midió la memoria ni se usó cProfile: otra medición en curso ya los está usando."
+        if self.memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._inicio_tracemalloc = True
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+        perfilador = cProfile.Profile() if self.cprofile else None
+        inicio = time.perf_counter()
+        if perfilador is not None:
+            try:
+                perfilador.enable()
+            except ValueError as e:
+                # otra herramienta de perfilado ajena a este módulo está activa
+                self.cprofile = False
+                self.aviso = f"No se usó cProfile: {e}."
+                perfilador = None
+        try:
+            resultado = funcion(*args, **kwargs)
+        finally:
+            if perfilador is not None:
+                perfilador.disable()
+            segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] - memoria_inicial if self.memoria else None
+
+        registro = self.etapas.setdefault(etapa, {"etapa": etapa, "llamadas": 0, "segundos": 0.0, "filas_entrada": None,
+                                                   "filas_salida": None, "memoria_pico_mb": None})
+        registro["llamadas"] += 1
+        registro["segundos"] += segundos
+        filas_salida = _largo(resultado)
+        if filas_entrada is not None:
+            registro["filas_entrada"] = (registro["filas_entrada"] or 0) + filas_entrada
+        if filas_salida is not None:
+            registro["filas_salida"] = (registro["filas_salida"] or 0) + filas_salida
+        if pico is not None:
+            registro["memoria_pico_mb"] = max(registro["memoria_pico_mb"] or 0.0, pico / 2**20)
+        if perfilador is not None and (self._mas_lento is None or segundos > self._mas_lento[1]):
+            self._mas_lento = (etapa, segundos, perfilador)
+        return resultado
+
+    def tabla(self) -> pd.DataFrame:
+        """Una fila por etapa, en el orden en que se midieron."""
+        return pd.DataFrame(list(self.etapas.values()), columns=["etapa", "llamadas", "segundos", "filas_entrada",
+                                                                  "filas_salida", "memoria_pico_mb"])
+
+    def reporte_cprofile(self, lineas: int = 25) -> str:
+        """Las `lineas` funciones con más tiempo acumulado en la medición más lenta (None si no se usó cProfile)."""
+        if self._mas_lento is None:
+            return None
+        salida = io.StringIO()
+        pstats.Stats(self._mas_lento[2], stream=salida).sort_stats("cumulative").print_stats(lineas)
+        return salida.getvalue()
+
+    def como_dict(self) -> dict:
+        """Resultado serializable (se puede regresar desde otro proceso): etapas, etapa perfilada con cProfile y su reporte."""
+        return {
+            "etapas": [dict(registro) for registro in self.etapas.values()],
+            "etapa_cprofile": self._mas_lento[0] if self._mas_lento else None,
+            "cprofile": self.reporte_cprofile(),
+            "aviso": self.aviso,
+        }
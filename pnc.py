@@ -1,13 +1,12 @@
 import pandas as pd
 import numpy as np
-from utils import get_encoding
+from utils import leer_csv, asignar_pendientes, parsear_fechas, campos_huella, tipar_edo_cta
+from extractor import ExtractorClaves, PATRON_TRASPASO
 import re
 
 def preprocess_pnc(uploaded_file)->pd.DataFrame:
     # para PNC, se recibe como .csv
-    encoding = get_encoding(uploaded_file=uploaded_file)
-    uploaded_file.seek(0)                        # reiniciar el puntero del archivo
-    df = pd.read_csv(uploaded_file, encoding=encoding, sep=",")
+    df = leer_csv(uploaded_file, "PNC", sep=",")
     # Reference a string sin "'" y sin espacios
     df["Reference"] = df["Reference"].astype(str).str.replace("'", "", regex=False).str.replace(" ", "", regex=False)
     df["Description"] = df["Description"].astype(str)
@@ -47,7 +46,45 @@ def asign_cve_pnc(row):
         # Si la referencia es diferente de "00000000000", asignamos la referencia a cve
         cve = ref
 
-    return cve    
+    return cve
+
+# reglas de clave de PNC sobre la descripción, en orden de prioridad
+EXTRACTOR_PNC = ExtractorClaves([
+    ("pago", r"OBI:([TG]\d{10})"),
+    ("traspaso", PATRON_TRASPASO),
+])
+
+def asign_cve_pnc_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_pnc`: resuelve la cascada de reglas con `EXTRACTOR_PNC`, que evalúa regla por regla sobre las descripciones distintas que siguen sin clave."""
+    ref = edo_cta["Reference"]
+    descripcion = edo_cta["Description"]
+    cve = EXTRACTOR_PNC.extraer(descripcion)["clave"]
+    pendientes = cve.isna()
+    # referencia genérica: [BaiControl]_[primeros 8 dígitos del importe]
+    generica = pendientes & (ref == "00000000000")
+    importe = edo_cta.loc[generica, "Amount"].astype(str)
+    for caracter in [".", ",", "-", " ", "'"]:
+        importe = importe.str.replace(caracter, "", regex=False)
+    pendientes = asignar_pendientes(cve, pendientes, edo_cta.loc[generica, "BaiControl"].astype(str) + "_" + importe.str[:8])
+    # en otro caso, la referencia
+    asignar_pendientes(cve, pendientes, ref[pendientes], resueltas=pendientes.index[pendientes])
+    return cve
+
+def importes_pnc(importes:pd.Series)->pd.Series:
+    """Importes del csv a numérico, con los nulos en 0."""
+    return pd.to_numeric(importes.astype(str).str.replace(",", "").str.replace(" ", "").str.replace("'",""), errors="coerce").fillna(0)
+
+def fechas_pnc(fechas:pd.Series)->pd.Series:
+    """Convierte las fechas del csv ("mm/dd/aaaa" o "mm-dd-aa") a datetime."""
+    return parsear_fechas(fechas, "%m/%d/%Y",
+                          normalizar=lambda x: x.str.replace(r'(\d{2})-(\d{2})-(\d{2})', r'\1/\2/20\3', regex=True))
+
+def huella_pnc(df:pd.DataFrame)->pd.DataFrame:
+    """
+    Campos que identifican cada movimiento leído en el procesamiento incremental (ver `utils.campos_huella`).
+    El archivo no trae saldo; el signo del importe está en "Transaction", que va con el texto.
+    """
+    return campos_huella(fechas_pnc(df["AsOfDate"]), importes_pnc(df["Amount"]), None, df.drop(columns=["AsOfDate", "Amount"]))
 
 def format_pnc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     # formateamos el DataFrame para que tenga las columnas necesarias
@@ -61,7 +98,7 @@ def format_pnc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
         "cve": "CLAVE"
     })
     # transformamos Amount a numérico y llenamos los nulos con 0
-    edo_cta["Amount"] = pd.to_numeric(edo_cta["Amount"].astype(str).str.replace(",", "").str.replace(" ", "").str.replace("'",""), errors="coerce").fillna(0)
+    edo_cta["Amount"] = importes_pnc(edo_cta["Amount"])
     # determinamos si es cargo o abono
     cargo_kw = ['Debits', 'DB', 'Fees']
     abono_kw = ['Credits', 'CR', 'Deposits']
@@ -69,27 +106,24 @@ def format_pnc(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["CARGO"] = np.where(edo_cta["CONCEPTO"].str.contains('|'.join(cargo_kw), case=False, na=False), edo_cta["Amount"], 0)
     # ABONO es el importe si "CONCEPTO" contiene alguna de las palabras clave de abono, si no, es 0
     edo_cta["ABONO"] = np.where(edo_cta["CONCEPTO"].str.contains('|'.join(abono_kw), case=False, na=False), edo_cta["Amount"], 0)
-    # verificar que no haya filas donde CARGO y ABONO sean ambos 0
-    if len(edo_cta[(edo_cta["CARGO"] == 0) & (edo_cta["ABONO"] == 0)]) > 0:
-        print("Hay filas donde CARGO y ABONO son ambos 0")
-        print(edo_cta[(edo_cta["CARGO"] == 0) & (edo_cta["ABONO"] == 0)])
+    # las filas donde CARGO y ABONO son ambos 0 se reportan en la validación (validacion.py)
     
     # convertimos la columna "Descripción" a tipo string
     edo_cta["DESCRIPCIÓN"] = edo_cta["DESCRIPCIÓN"].astype(str)
 
     # unificamos el formato de fecha
-    edo_cta["FECHA"] = edo_cta["FECHA"].astype(str).str.replace(r'(\d{2})-(\d{2})-(\d{2})', r'\1/\2/20\3', regex=True)
     # edo_cta["FECHA"] = edo_cta.apply(extract_desc_date, axis=1)
-    edo_cta["FECHA"] = pd.to_datetime(edo_cta["FECHA"], format="%m/%d/%Y", errors="raise") 
+    edo_cta["FECHA"] = fechas_pnc(edo_cta["FECHA"])
 
     # asignamos una columna de "BANCO" con el nombre del banco
     edo_cta["BANCO"] = 'PNC'
     edo_cta["CUENTA"] = cta
-    # las columnas "CONCEPTO" y "SALDO" se llenan con "#"
+    # el archivo de PNC no trae saldo: la columna "SALDO" queda nula
     # edo_cta["CONCEPTO"] = "#"
-    edo_cta["SALDO"] = "#"
+    edo_cta["SALDO"] = np.nan
     edo_cta["BENEFICIARIO"] = "#"
-    return edo_cta
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
 
 def extract_desc_date(row):
     """Extrae la fecha real de aplicación del pago si esta se encuentra en la descripción"""
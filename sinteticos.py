@@ -0,0 +1,162 @@
+"""
+Generadores de estados de cuenta sintéticos con el formato de archivo de cada banco,
+para medir el rendimiento (bench.py) sin usar estados de cuenta reales.
+
+Cada generador recibe el número de movimientos y un `random.Random` y regresa el contenido del archivo en bytes.
+Las descripciones mezclan los casos de todas las reglas de clave de cada banco (pago, traspaso, nómina,
+comisiones, IVA, referencias genéricas y movimientos sin clave reconocible).
+"""
+import io
+import random
+import pandas as pd
+
+def _importe(r: random.Random) -> float:
+    return round(r.choice([r.uniform(1, 500), r.uniform(500, 2e5)]), 2)
+
+def generar_bnx(n: int, r: random.Random) -> bytes:
+    # csv con preámbulo; la tabla empieza después de "Detalle de Movimientos - Depósitos y Retiros"
+    descs = [
+        "PAGO T{0:010d} Referencia Númerica: 123 Autorización: 5555",
+        "SPEI TMLG{1:06d} Referencia Númerica: 77 Autorización: 8888",
+        "NOM QNA BNM1XY Referencia Númerica: 4 Autorización: 99",
+        "NOM SIN CLAVE Referencia Númerica: 4 Autorización: 991",
+        "PAGO TERCEROS NO.AU Y{0:010d} {1:06d}",
+        "Nominas Vig 88MINABCDE12345FGHIJ extra",
+        "PAGO A TERCEROS AB12CD PAGO DE SERVI",
+        "pago a terceros zz99 x",
+        "AB12CD Referencia Númerica: 0001 Autorización: 3",
+        "ABC Referencia Númerica: 0001 Autorización: 4",
+        "TRANSF LY{1:06d}_{2} algo",
+        "PAGOS FACTS MULTILOG",
+        "COMISION COM. Referencia Númerica: 1 Autorización: 00123",
+        "IVA COMISION Referencia Númerica: 1 Autorización: 00124",
+        " IVACOM x Autorización: 777",
+        "DEPOSITO Autorización: 000456 XX 0001",
+        "XX 00012 DISPOSICION",
+        "TRASPASO REF 12 DE FO 0009 Referencia Númerica: 3 Autorización: 1",
+        "COMPRA INVERSION Referencia Númerica: 1 Autorización: 2",
+        "VENTA DOLARES Referencia Númerica: 1 Autorización: 2",
+        "SIN NADA",
+        "NPRO{1:06d}T{0:010d}",
+        "REEM{1:06d}",
+        "GASTO G{0:010d}",
+    ]
+    filas = []
+    for _ in range(n):
+        desc = r.choice(descs).format(r.randrange(10**10), r.randrange(10**6), r.randrange(1000))
+        deposito = _importe(r) if r.random() < .5 else None
+        retiro = None if deposito else _importe(r)
+        if r.random() < .5:
+            fecha = f"{r.randint(1, 28):02d}-{r.randint(1, 12):02d}-{r.choice(['25', '2025'])}"
+        else:
+            fecha = f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/25"
+        filas.append([fecha, desc, f"{deposito:,.2f}" if deposito else "", f"{retiro:,.2f}" if retiro else "",
+                      f"{r.uniform(0, 1e6):,.2f}"])
+    df = pd.DataFrame(filas, columns=["Fecha", "Descripción", "Depósitos", "Retiros", "Saldo"])
+    preambulo = "Banamex\nCuenta,828\nResumen,,\n\nDetalle de Movimientos - Depósitos y Retiros\n"
+    return (preambulo + df.to_csv(index=False)).encode("latin-1")
+
+def generar_stder(n: int, r: random.Random) -> bytes:
+    # csv con todos los campos entre comillas y valores con apóstrofo inicial
+    conceptos = ["PAGO T{0:010d}", "TMLG{1:06d} TRASPASO", "NOM QNA BNM1XY", "NOM sin", "CREDITO CRE_{1}", "", "REF LIBRE", "CRE_{1} pago"]
+    descs = ["COMISION SPEI", "IVA COMISION", "COM TRANSF", "ABONO CAP", "PAGO INT", "TRANSFERENCIA SPEI RECIBIDA", "CARGO"]
+    filas = []
+    for _ in range(n):
+        concepto = r.choice(conceptos).format(r.randrange(10**10), r.randrange(10**6))
+        referencia = r.choice(["'0000000'", "''", "'123456'", "' 0 0 '", "'ABC12'"])
+        filas.append(["'" + f"{r.randint(1, 28):02d}{r.randint(1, 12):02d}2025" + "'", f"{r.randint(0, 23):02d}:{r.randint(0, 59):02d}",
+                      r.choice(descs), r.choice(["+", "-"]), f"{_importe(r):,.2f}", f"{r.uniform(0, 1e6):,.2f}", referencia, concepto,
+                      r.choice(["'012180001234567890'", "", "'sin'"]), r.choice(["'JUAN PEREZ'", ""])])
+    df = pd.DataFrame(filas, columns=["Fecha", "Hora", "Descripcion", "Cargo/Abono", "Importe", "Saldo", "Referencia", "Concepto",
+                                      "Clabe Beneficiario", "Nombre Beneficiario"])
+    return df.to_csv(index=False, quoting=1).encode("latin-1")
+
+def generar_hsbc(n: int, r: random.Random) -> bytes:
+    # xlsx con importes numéricos; incluye abonos FIPP y cargos de crédito que se consolidan por día
+    filas = []
+    for _ in range(n):
+        k = r.random()
+        fecha = f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/2025"
+        if k < .1:
+            fila = [fecha, "ABONO FIPP DIA", "X", "5203", None, _importe(r)]
+        elif k < .2:
+            fila = [fecha, "CARGO CREDITO: 12345678", "X", "1065", -_importe(r), None]
+        elif k < .3:
+            fila = [fecha, "ABONO POR CARTERA REMANENTE ACME X", "R1", "5203", None, _importe(r)]
+        elif k < .4:
+            fila = [fecha, "CGO SPEI A T%010d" % r.randrange(10**10), "REF", "1001", -_importe(r), None]
+        elif k < .5:
+            fila = [fecha, "C TRANSF", "REF 1", r.choice(["1661", "1725", "1523"]), -_importe(r), None]
+        elif k < .6:
+            fila = [fecha, "I.V.A.", "REF 2", "1501", -_importe(r), None]
+        elif k < .7:
+            fila = [fecha, "DEP", "A2000%05d" % r.randrange(10**5), "1200", None, _importe(r)]
+        elif k < .8:
+            fila = [fecha, "SPEI NETNM PAGO X Y", "D%05d" % r.randrange(10**5), "1300", None, _importe(r)]
+        elif k < .9:
+            fila = [fecha, "NOM PAGO BNM1XY TMLG%06d" % r.randrange(10**6), "'ZZ", "1400", -_importe(r), None]
+        else:
+            fila = [fecha, "CGO NPRO%06d" % r.randrange(10**6), "Q", "1661", -_importe(r), None]
+        filas.append(fila + [r.uniform(0, 1e6)])
+    df = pd.DataFrame(filas, columns=["Fecha del apunte", "Descripción", "Referencia de cliente", "Referencia bancaria",
+                                      "Importe del débito", "Importe de crédito", "Saldo"])
+    salida = io.BytesIO()
+    df.to_excel(salida, index=False)
+    return salida.getvalue()
+
+def generar_bbva(n: int, r: random.Random) -> bytes:
+    # txt separado por tabuladores, "Concepto / Referencia" con espacio inicial
+    refs = ["SPEI ENVIADO/T{0:010d} x", "TRASP/TMLG{1:06d}", "NOMINA/NOM BNM1XY", "NOMINA/NOM sin", "PAGO/GUIA:{2:07d}", "DEP/{0:010d} abc",
+            "X/NOTPROVIDED", "COM/IVA COM", "COM/COM MENS", "OTRO/ALGO MAS", "SIN REF", "A/B/C"]
+    lineas = ["Día\tConcepto / Referencia\tcargo\tAbono\tSaldo"]
+    for _ in range(n):
+        ref = r.choice(refs).format(r.randrange(10**10), r.randrange(10**6), r.randrange(10**7))
+        cargo = _importe(r) if r.random() < .5 else 0
+        abono = 0 if cargo else _importe(r)
+        lineas.append(f"{r.randint(1, 28):02d}-{r.randint(1, 12):02d}-2025\t {ref}\t{cargo:,.2f}\t{abono:,.2f}\t{r.uniform(0, 1e6):,.2f}")
+    return ("\n".join(lineas) + "\n").encode("latin-1")
+
+def generar_brte(n: int, r: random.Random) -> bytes:
+    # csv con importes "$1,234.56" o "-" y fechas con mes numérico o abreviado en español
+    detalles = ["PAGO T{0:010d}", "CONCEPTO: TMLG{1:06d}", "NOM BNM1XY", "NOM x", "SPEI RECIBIDO CUENTA: 0123 RFC: ABC 010101 XY1",
+                "R.F.C. ABCD010101XY1", "NADA"]
+    filas = []
+    for _ in range(n):
+        dia = r.randint(1, 28)
+        fecha = r.choice([f"{dia:02d}/{r.randint(1, 12):02d}/2025", f"{dia}/{r.choice(['ene', 'feb', 'jun', 'dic'])}./2026", f"{dia:02d}/Jun/2026"])
+        desc = r.choice(["COMISION", "IVA COMISION", "SPEI CUENTA: 555 RFC: XAXX010101000", "DEPOSITO"])
+        deposito = _importe(r) if r.random() < .5 else 0
+        retiro = 0 if deposito else _importe(r)
+        filas.append([fecha, "0001", desc, "0420", "0123", f"${deposito:,.2f}" if deposito else "-", f"${retiro:,.2f}" if retiro else "-",
+                      f"${r.uniform(0, 1e6):,.2f}", str(r.randrange(10**6)), r.choice(detalles).format(r.randrange(10**10), r.randrange(10**6))])
+    df = pd.DataFrame(filas, columns=["FECHA", "REFERENCIA", "DESCRIPCIÓN", "COD. TRANSAC", "SUCURSAL", "DEPÓSITOS", "RETIROS", "SALDO",
+                                      "MOVIMIENTO", "DESCRIPCIÓN DETALLADA"])
+    return df.to_csv(index=False).encode("utf-8")
+
+def generar_pnc(n: int, r: random.Random) -> bytes:
+    # csv con fechas "MM/DD/YYYY" o "MM-DD-YY" y referencia genérica '00000000000
+    descs = ["WIRE TRANSFER IN OBI:T{0:010d}", "ACH CREDIT RECEIVED TMLG{1:06d}", "SWEEP", "TRNSFR FR INVESTMENT",
+             "ACCOUNT TRANSFER FROM 0004954859906", "FEE"]
+    filas = []
+    for _ in range(n):
+        fecha = f"{r.randint(1, 12):02d}/{r.randint(1, 28):02d}/2025" if r.random() < .5 else f"{r.randint(1, 12):02d}-{r.randint(1, 28):02d}-25"
+        filas.append([fecha, r.randrange(10**6), r.choice(["'00000000000", "'12345 678"]),
+                      r.choice(descs).format(r.randrange(10**10), r.randrange(10**6)),
+                      r.choice(["Credits", "Debits", "Fees", "Deposits", "Other"]), f"{_importe(r):,.2f}"])
+    df = pd.DataFrame(filas, columns=["AsOfDate", "BaiControl", "Reference", "Description", "Transaction", "Amount"])
+    return df.to_csv(index=False).encode("utf-8")
+
+# generador y cuenta de ejemplo de cada banco
+GENERADORES = {
+    "Banamex": (generar_bnx, "828"),
+    "Santander": (generar_stder, "383"),
+    "HSBC": (generar_hsbc, "019"),
+    "BBVA": (generar_bbva, "389"),
+    "Banorte": (generar_brte, "858"),
+    "PNC": (generar_pnc, "865"),
+}
+
+def generar(bank: str, n: int, semilla: int = 0) -> bytes:
+    """Contenido de un estado de cuenta sintético de `n` movimientos del banco; la misma semilla da el mismo archivo."""
+    generador, _ = GENERADORES[bank]
+    return generador(n, random.Random(semilla))
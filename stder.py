@@ -1,13 +1,10 @@
 import pandas as pd
 import re
 import numpy as np
-from utils import get_encoding
+from utils import leer_csv, leer_csv_por_bloques, parsear_fechas, campos_huella, tipar_edo_cta
+from extractor import ExtractorClaves, PATRON_PAGO, PATRON_TRASPASO, PATRON_NOMINA
 
-def preprocess_stder(uploaded_file)->pd.DataFrame:
-    # para Santander, se recibe como .csv
-    encoding = get_encoding(uploaded_file)
-    uploaded_file.seek(0)  # reiniciar el puntero del archivo
-    df = pd.read_csv(uploaded_file, encoding=encoding, sep=",")
+def limpiar_stder(df:pd.DataFrame)->pd.DataFrame:
     # Importe y Saldo son columnas que contienen valores numéricos
     # convertimos las columnas "Importe" y "Saldo" a tipo numérico rellenando los nulos con 0
     df["Importe"] = pd.to_numeric(df["Importe"].astype(str).str.replace(",", "").str.replace(" ", "").str.replace("'",""), errors="coerce").fillna(0)
@@ -19,6 +16,17 @@ def preprocess_stder(uploaded_file)->pd.DataFrame:
 
     return df
 
+def preprocess_stder(uploaded_file)->pd.DataFrame:
+    # para Santander, se recibe como .csv
+    df = leer_csv(uploaded_file, "Santander", sep=",")
+
+    return limpiar_stder(df)
+
+def iter_stder(uploaded_file, chunksize:int):
+    """Lee el csv de Santander en bloques de `chunksize` filas, detectando la codificación con una muestra del inicio del archivo (ver `utils.leer_csv_por_bloques`)."""
+    for df in leer_csv_por_bloques(uploaded_file, chunksize, "Santander", sep=","):
+        yield limpiar_stder(df)
+
 def asign_cve_stder(row):
     cve = np.nan
     # Si "Referencia" no es vacío y no es NaN o espacios, asignamos "Referencia" a cve
@@ -73,6 +81,51 @@ def asign_cve_stder(row):
             cve = "_".join(desc.split()) + "_" + row["Fecha"].replace("'", "")
     return cve
 
+# reglas de clave de Santander sobre el concepto, en orden de prioridad
+EXTRACTOR_STDER = ExtractorClaves([
+    ("pago", PATRON_PAGO),
+    ("traspaso", PATRON_TRASPASO),
+    ("nomina", PATRON_NOMINA, "NOM "),
+    # solo aplica si la referencia está vacía
+    ("credito", r"(CRE_\d+)"),
+])
+
+def asign_cve_stder_vec(edo_cta:pd.DataFrame)->pd.Series:
+    """Versión vectorizada de `asign_cve_stder`: resuelve la cascada de reglas con `EXTRACTOR_STDER`, que evalúa regla por regla sobre los conceptos distintos que siguen sin clave."""
+    ref = edo_cta["Referencia"].str.strip()
+    desc = edo_cta["Descripcion"].str.strip()
+    concep = edo_cta["Concepto"].str.strip()
+    extraido = EXTRACTOR_STDER.extraer(concep)
+    cve = extraido["clave"].copy()
+    pendientes = ~extraido["regla"].isin(["pago", "traspaso", "nomina"])
+    # referencia no vacía ni de puros ceros, con sufijo "_IVA" o "_COM" según la descripción
+    con_ref = pendientes & (ref.str.replace(" ", "", regex=False).str.replace("0", "", regex=False) != "")
+    iva = desc.str.contains("IVA", regex=False)
+    com = desc.str.contains("COM ", regex=False) | desc.str.contains("COMISION", regex=False)
+    cve[con_ref] = ref[con_ref] + np.where(iva[con_ref], "_IVA", np.where(com[con_ref], "_COM", ""))
+    pendientes &= ~con_ref
+    # "CRE_[dígitos]" en el concepto, con sufijo "_CAP" o "_INT" según la descripción
+    credito = pendientes & (extraido["regla"] == "credito")
+    cap = desc[credito].str.contains("CAP", regex=False)
+    intereses = desc[credito].str.contains("INT", regex=False)
+    cve[credito] = cve[credito] + np.where(cap, "_CAP", np.where(intereses, "_INT", ""))
+    pendientes &= ~credito
+    # palabras de la descripción unidas con "_" más la fecha
+    cve[pendientes] = desc[pendientes].str.split().str.join("_") + "_" + edo_cta.loc[pendientes, "Fecha"].str.replace("'", "", regex=False)
+    return cve
+
+def fechas_stder(fechas:pd.Series, horas:pd.Series)->pd.Series:
+    """Convierte la fecha del csv, que viene como "'ddmmyyyy'", y la hora ("HH:MM") a datetime."""
+    # corregimos el formato de la fecha, que viene como "'ddmmyyyy'"
+    fechas = fechas.astype(str).str.replace("'", "", regex=False).str.strip()
+    return parsear_fechas(fechas + " " + horas, "%d%m%Y %H:%M")
+
+def huella_stder(df:pd.DataFrame)->pd.DataFrame:
+    """Campos que identifican cada movimiento leído en el procesamiento incremental (ver `utils.campos_huella`)."""
+    importes = df["Importe"].where(df["Cargo/Abono"] != "-", -df["Importe"])
+    return campos_huella(fechas_stder(df["Fecha"], df["Hora"]), importes, df["Saldo"],
+                         df.drop(columns=["Fecha", "Hora", "Importe", "Saldo"]))
+
 def format_stder(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta = edo_cta.rename(columns={
         "Fecha": "FECHA",
@@ -82,14 +135,8 @@ def format_stder(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
         "Concepto": "CONCEPTO",
         "cve": "CLAVE"
     })
-    # corregimos el formato de la fecha, que viene como "'ddmmyyyy'"
-    # y lo convertimos a "dd-mm-yyyy"
-    edo_cta["FECHA"] = edo_cta["FECHA"].astype(str).str.replace("'", "", regex=False).str.strip()
-    # edo_cta["FECHA"] = edo_cta["FECHA"].str.replace(r'(\d{2})(\d{2})(\d{4})', r'\1-\2-\3')
-    # print(edo_cta["FECHA"].sample(10))
-    # print(edo_cta["FECHA"].apply(lambda x: repr(x)).sample(10))
     # convertimos la columna "Fecha" a tipo datetime usando también la columna "Hora"
-    edo_cta["FECHA"] = pd.to_datetime(edo_cta["FECHA"]+" " + edo_cta["Hora"], format="%d%m%Y %H:%M", errors="raise")
+    edo_cta["FECHA"] = fechas_stder(edo_cta["FECHA"], edo_cta["Hora"])
 
     # CARGO es el importe si "Cargo/Abono" es "-", si no, es 0
     edo_cta["CARGO"] = np.where(edo_cta["Cargo/Abono"] == "-", edo_cta["Importe"], 0)
@@ -106,4 +153,5 @@ def format_stder(edo_cta:pd.DataFrame, cta:str)->pd.DataFrame:
     edo_cta["Nombre Beneficiario"] = edo_cta["Nombre Beneficiario"].fillna("").astype(str).str.replace("'", "", regex=False).str.strip()
     edo_cta["BENEFICIARIO"] = edo_cta.apply(lambda x: 'CLABE: '+(re.search(r"\d+", x["Clabe Beneficiario"]).group(0) if re.search(r"\d+", x["Clabe Beneficiario"]) else '') + ' Nombre: ' + x["Nombre Beneficiario"], axis=1).replace("CLABE:  Nombre: ", "#")
 
-    return edo_cta
\ No newline at end of file
+    # tipos del resultado (config.TIPOS_EDO_CTA)
+    return tipar_edo_cta(edo_cta)
\ No newline at end of file
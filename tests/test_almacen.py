@@ -0,0 +1,18 @@
+import io
+from almacen import guardar_movimientos, consultar_movimientos
+from cves import asign_cve
+from sinteticos import generar
+
+def test_estados_de_cuenta_traslapados(tmp_path):
+    # el de 300 movimientos trae los mismos 200 primeros movimientos que el de 200 (el generador produce las filas en orden)
+    ruta = str(tmp_path / "movimientos.sqlite")
+    completo = generar("Banamex", 300)
+    lineas = completo.splitlines(keepends=True)
+    previo = b"".join(lineas[:len(lineas) - 100])
+    df_previo = asign_cve(io.BytesIO(previo), "Banamex", "828")
+    df_completo = asign_cve(io.BytesIO(completo), "Banamex", "828")
+
+    assert guardar_movimientos(df_previo, ruta) == 200
+    assert guardar_movimientos(df_completo, ruta) == 100
+    assert guardar_movimientos(df_completo, ruta) == 0
+    assert len(consultar_movimientos(banco="Banamex", cuenta="828", ruta=ruta)) == 300
@@ -0,0 +1,42 @@
+import io
+import pytest
+import pandas as pd
+import cves
+from cves import asign_cve
+from incremental import AlmacenIncremental
+from sinteticos import GENERADORES, generar
+
+FILAS_PREVIAS = 200
+FILAS_NUEVAS = 100
+
+@pytest.fixture
+def almacenes(tmp_path, monkeypatch):
+    """Almacenes incrementales creados por asign_cve, guardados en una carpeta temporal."""
+    creados = []
+    def crear(bank, cta, huella):
+        almacen = AlmacenIncremental(bank, cta, huella, carpeta=str(tmp_path))
+        creados.append(almacen)
+        return almacen
+    monkeypatch.setattr(cves, "AlmacenIncremental", crear)
+    return creados
+
+@pytest.mark.parametrize("bank", ["Banamex", "Santander", "Banorte", "BBVA", "PNC"])
+@pytest.mark.parametrize("chunksize", [None, 64])
+def test_reproceso_con_filas_agregadas(almacenes, bank, chunksize):
+    # el generador produce las filas en orden, así que el archivo corto son las primeras filas del largo;
+    # con bloques de 64 filas, las últimas filas previas se leen en un bloque distinto en cada archivo
+    cta = GENERADORES[bank][1]
+    completo = generar(bank, FILAS_PREVIAS + FILAS_NUEVAS)
+    lineas = completo.splitlines(keepends=True)
+    encabezado = len(lineas) - (FILAS_PREVIAS + FILAS_NUEVAS)
+    previo = b"".join(lineas[:encabezado + FILAS_PREVIAS])
+
+    asign_cve(io.BytesIO(previo), bank, cta, chunksize=chunksize, incremental=True)
+    assert almacenes[0].reutilizadas == 0
+
+    df = asign_cve(io.BytesIO(completo), bank, cta, chunksize=chunksize, incremental=True)
+    assert almacenes[1].filas == FILAS_PREVIAS + FILAS_NUEVAS
+    assert almacenes[1].reutilizadas == FILAS_PREVIAS
+
+    esperado = asign_cve(io.BytesIO(completo), bank, cta, chunksize=chunksize)
+    pd.testing.assert_frame_equal(df, esperado)
@@ -0,0 +1,18 @@
+import io
+import pytest
+from cves import asign_cve
+from bench import REFERENCIA_BENCH, huellas_columnas, leer_referencia
+from sinteticos import GENERADORES, generar
+
+# huellas por columna de la salida del código original (ver bench.py --verificar)
+REFERENCIA = leer_referencia(REFERENCIA_BENCH)
+
+@pytest.mark.parametrize("bank", list(GENERADORES))
+def test_salida_igual_a_la_referencia(bank):
+    esperado = REFERENCIA["bancos"][bank]
+    contenido = generar(bank, REFERENCIA["filas"], REFERENCIA["semilla"])
+    df = asign_cve(io.BytesIO(contenido), bank, GENERADORES[bank][1])
+    assert len(df) == esperado["filas"]
+    huellas = huellas_columnas(df)
+    diferentes = [col for col, huella in esperado["columnas"].items() if huellas.get(col) != huella]
+    assert diferentes == []
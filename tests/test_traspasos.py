@@ -0,0 +1,69 @@
+import pandas as pd
+from traspasos import conciliar_traspasos
+
+def movimientos(filas: list) -> pd.DataFrame:
+    """Resultado de asign_cve con los movimientos dados como (banco, cuenta, fecha, clave, cargo, abono)."""
+    df = pd.DataFrame(filas, columns=["BANCO", "CUENTA", "FECHA", "CLAVE", "CARGO", "ABONO"])
+    return df.assign(FECHA=pd.to_datetime(df["FECHA"]), DETALLE="#")
+
+def test_par_unico_conciliado():
+    df = movimientos([
+        ("Banamex", "828", "2025-03-03", "TMLG000001", 1500.0, 0.0),
+        ("Santander", "383", "2025-03-04", "TMLG000001", 0.0, 1500.0),
+        ("Banamex", "828", "2025-03-04", "T0000000001", 99.0, 0.0),
+    ])
+    resultado = conciliar_traspasos(df)
+    assert len(resultado["conciliados"]) == 1
+    par = resultado["conciliados"].iloc[0]
+    assert (par["FILA_SALIDA"], par["FILA_ENTRADA"]) == (0, 1)
+    assert par["DIAS"] == 1
+    assert par["IMPORTE"] == 1500.0
+    assert resultado["ambiguos"].empty
+    assert resultado["sin_contraparte"].empty
+
+def test_una_salida_con_varias_entradas_es_ambigua():
+    df = movimientos([
+        ("Banamex", "828", "2025-03-03", "TMLG000002", 800.0, 0.0),
+        ("Santander", "383", "2025-03-03", "TMLG000002", 0.0, 800.0),
+        ("BBVA", "389", "2025-03-04", "TMLG000002", 0.0, 800.0),
+    ])
+    resultado = conciliar_traspasos(df)
+    assert resultado["conciliados"].empty
+    assert sorted(resultado["ambiguos"]["FILA_ENTRADA"]) == [1, 2]
+    assert (resultado["ambiguos"]["FILA_SALIDA"] == 0).all()
+    assert resultado["sin_contraparte"].empty
+
+def test_fuera_de_la_ventana_sin_contraparte():
+    df = movimientos([
+        ("Banamex", "828", "2025-03-03", "TMLG000003", 250.0, 0.0),
+        ("Santander", "383", "2025-03-10", "TMLG000003", 0.0, 250.0),
+    ])
+    resultado = conciliar_traspasos(df, ventana_dias=3)
+    assert resultado["conciliados"].empty
+    assert resultado["ambiguos"].empty
+    assert resultado["sin_contraparte"]["FILA"].tolist() == [0, 1]
+
+    resultado = conciliar_traspasos(df, ventana_dias=7)
+    assert len(resultado["conciliados"]) == 1
+
+def test_par_de_la_misma_cuenta_excluido():
+    df = movimientos([
+        ("Banamex", "828", "2025-03-03", "TMLG000004", 300.0, 0.0),
+        ("Banamex", "828", "2025-03-03", "TMLG000004", 0.0, 300.0),
+    ])
+    resultado = conciliar_traspasos(df)
+    assert resultado["conciliados"].empty
+    assert resultado["ambiguos"].empty
+    assert resultado["sin_contraparte"]["LADO"].tolist() == ["SALIDA", "ENTRADA"]
+
+def test_importes_flotantes_se_comparan_en_centavos():
+    # 0.1 + 0.2 != 0.3 en punto flotante, pero son los mismos centavos
+    df = movimientos([
+        ("Banamex", "828", "2025-03-03", "TMLG000005", 0.1 + 0.2, 0.0),
+        ("Santander", "383", "2025-03-03", "TMLG000005", 0.0, 0.3),
+        ("Banamex", "828", "2025-03-03", "TMLG000006", 100.0, 0.0),
+        ("Santander", "383", "2025-03-03", "TMLG000006", 0.0, 100.01),
+    ])
+    resultado = conciliar_traspasos(df)
+    assert resultado["conciliados"][["FILA_SALIDA", "FILA_ENTRADA"]].values.tolist() == [[0, 1]]
+    assert resultado["sin_contraparte"]["FILA"].tolist() == [2, 3]
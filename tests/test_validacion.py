@@ -0,0 +1,43 @@
+import io
+import numpy as np
+import pandas as pd
+from cves import asign_cve
+from validacion import validar_edo_cta
+
+def edo_cta_bnx(filas: list) -> io.BytesIO:
+    """csv de Banamex con los movimientos dados como (fecha, descripción, depósito, retiro, saldo)."""
+    texto = "Banamex\nCuenta,828\n\nDetalle de Movimientos - Depósitos y Retiros\nFecha,Descripción,Depósitos,Retiros,Saldo\n"
+    texto += "".join(f'{fecha},{descripcion},"{deposito}","{retiro}","{saldo}"\n' for fecha, descripcion, deposito, retiro, saldo in filas)
+    return io.BytesIO(texto.encode("latin-1"))
+
+def test_saldo_vacio_de_banamex_no_es_ruptura():
+    archivo = edo_cta_bnx([
+        ("01-03-2025", "DEPOSITO Autorización: 1", "1,000.00", "", "1,000.00"),
+        ("02-03-2025", "PAGO T0000000001", "", "200.00", ""),
+        ("03-03-2025", "PAGO T0000000002", "", "300.00", "500.00"),
+        ("04-03-2025", "DEPOSITO Autorización: 2", "50.00", "", "550.00"),
+    ])
+    df = asign_cve(archivo, "Banamex", "828")
+    assert pd.isna(df["SALDO"].iloc[1])
+
+    reporte = validar_edo_cta(df)
+    resumen = reporte["resumen"].iloc[0]
+    assert resumen["SALDO_VERIFICADO"]
+    assert resumen["SIN_SALDO"] == 1
+    assert resumen["RUPTURAS_SALDO"] == 0
+    assert reporte["rupturas"].empty
+
+def test_ruptura_despues_de_saldo_vacio():
+    df = pd.DataFrame({
+        "BANCO": "Banamex", "CUENTA": "828",
+        "FECHA": pd.to_datetime(["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-04"]),
+        "DETALLE": "#", "CLAVE": "#",
+        "CARGO": [0.0, 200.0, 300.0, 0.0],
+        "ABONO": [1000.0, 0.0, 0.0, 50.0],
+        # el último saldo debería ser 550
+        "SALDO": [1000.0, np.nan, 500.0, 560.0],
+    })
+    reporte = validar_edo_cta(df)
+    assert reporte["resumen"]["RUPTURAS_SALDO"].iloc[0] == 1
+    assert reporte["rupturas"]["FILA"].tolist() == [3]
+    assert reporte["rupturas"]["DIFERENCIA"].iloc[0] == 10.0
@@ -0,0 +1,75 @@
+"""
+Conciliación de traspasos entre cuentas MLG (claves TMLG[6 dígitos]): empareja el cargo de una cuenta con el abono
+de otra cuenta con la misma clave y el mismo importe, con fechas separadas por no más de una ventana de días.
+
+    resultado = conciliar_traspasos(df)      # df: resultados de asign_cve de varias cuentas, unidos
+    resultado["conciliados"], resultado["ambiguos"], resultado["sin_contraparte"]
+
+Las salidas y entradas se unen por (clave, importe en centavos) con un merge (hash join) y después se filtra
+la ventana de fechas, de modo que el costo crece con el número de traspasos y no con su cuadrado.
+Un par está conciliado si la salida y la entrada solo tienen esa contraparte posible; si alguna de las dos
+tiene más de una, todos sus pares posibles se reportan como ambiguos para revisarlos a mano.
+"""
+import pandas as pd
+from config import VENTANA_DIAS_TRASPASOS
+
+PATRON_CLAVE_TRASPASO = r"(TMLG\d{6})"
+COLS_LADO = ["FILA", "BANCO", "CUENTA", "FECHA", "IMPORTE", "DETALLE"]
+
+def movimientos_traspaso(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Movimientos con clave de traspaso MLG, con la clave normalizada en "CLAVE", el lado ("SALIDA" si es cargo,
+    "ENTRADA" si es abono), el importe y "FILA", la posición del movimiento en `df` (df.iloc[FILA]).
+    """
+    clave = df["CLAVE"].astype(str).str.extract(PATRON_CLAVE_TRASPASO, expand=False)
+    es_traspaso = (clave.notna() & ((df["CARGO"] > 0) | (df["ABONO"] > 0))).to_numpy()
+    mov = df.loc[es_traspaso, ["BANCO", "CUENTA", "FECHA", "CARGO", "ABONO", "DETALLE"]]
+    salida = mov["CARGO"].to_numpy() > 0
+    return pd.DataFrame({
+        "FILA": es_traspaso.nonzero()[0],
+        # texto para poder comparar banco y cuenta entre frames con distintas categorías
+        "BANCO": mov["BANCO"].astype(str).to_numpy(),
+        "CUENTA": mov["CUENTA"].astype(str).to_numpy(),
+        "FECHA": mov["FECHA"].to_numpy(),
+        "CLAVE": clave[es_traspaso].to_numpy(),
+        "LADO": pd.Series(salida).map({True: "SALIDA", False: "ENTRADA"}).to_numpy(),
+        "IMPORTE": mov["CARGO"].where(salida, mov["ABONO"]).to_numpy(),
+        "DETALLE": mov["DETALLE"].astype(str).to_numpy(),
+    })
+
+def conciliar_traspasos(df: pd.DataFrame, ventana_dias: int = VENTANA_DIAS_TRASPASOS) -> dict:
+    """
+    Regresa un diccionario de DataFrames:
+    "conciliados" y "ambiguos": pares (salida, entrada) con las columnas de cada lado con sufijo _SALIDA y _ENTRADA,
+    la clave, el importe y "DIAS" (días de la salida a la entrada);
+    "sin_contraparte": movimientos de traspaso sin ninguna contraparte posible.
+    Las columnas FILA_* y FILA son la posición del movimiento en `df`.
+    """
+    mov = movimientos_traspaso(df)
+    mov["CENTAVOS"] = (mov["IMPORTE"] * 100).round().astype("int64")
+    salidas = mov[mov["LADO"] == "SALIDA"]
+    entradas = mov[mov["LADO"] == "ENTRADA"]
+    candidatos = salidas[["CLAVE", "CENTAVOS"] + COLS_LADO].merge(
+        entradas[["CLAVE", "CENTAVOS"] + COLS_LADO], on=["CLAVE", "CENTAVOS"], suffixes=("_SALIDA", "_ENTRADA"))
+    dias = (candidatos["FECHA_ENTRADA"].dt.normalize() - candidatos["FECHA_SALIDA"].dt.normalize()).dt.days
+    otra_cuenta = (candidatos["BANCO_SALIDA"] != candidatos["BANCO_ENTRADA"]) | (candidatos["CUENTA_SALIDA"] != candidatos["CUENTA_ENTRADA"])
+    candidatos = candidatos.assign(DIAS=dias)[(dias.abs() <= ventana_dias) & otra_cuenta]
+    candidatos = candidatos.drop(columns=["CENTAVOS", "IMPORTE_ENTRADA"]).rename(columns={"IMPORTE_SALIDA": "IMPORTE"})
+
+    # contrapartes posibles de cada salida y de cada entrada
+    por_salida = candidatos.groupby("FILA_SALIDA")["FILA_SALIDA"].transform("size")
+    por_entrada = candidatos.groupby("FILA_ENTRADA")["FILA_ENTRADA"].transform("size")
+    unico = (por_salida == 1) & (por_entrada == 1)
+    con_contraparte = mov["FILA"].isin(candidatos["FILA_SALIDA"]) | mov["FILA"].isin(candidatos["FILA_ENTRADA"])
+    return {
+        "conciliados": candidatos[unico].sort_values("FECHA_SALIDA", kind="stable").reset_index(drop=True),
+        "ambiguos": candidatos[~unico].sort_values(["CLAVE", "FECHA_SALIDA"], kind="stable").reset_index(drop=True),
+        "sin_contraparte": mov[~con_contraparte].drop(columns="CENTAVOS").sort_values("FECHA", kind="stable").reset_index(drop=True),
+    }
+
+def resumen_traspasos(resultado: dict) -> pd.DataFrame:
+    """Número de pares (o movimientos, en sin_contraparte) e importe total de cada parte de la conciliación."""
+    return pd.DataFrame([
+        {"ESTADO": estado, "REGISTROS": len(resultado[estado]), "IMPORTE": resultado[estado]["IMPORTE"].sum()}
+        for estado in ["conciliados", "ambiguos", "sin_contraparte"]
+    ])
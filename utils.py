@@ -1,32 +1,223 @@
-import chardet
+import re
+import hashlib
+import warnings
+from collections import OrderedDict
+from chardet import UniversalDetector
 import pandas as pd
-def get_encoding(uploaded_file):
-    content = uploaded_file.read()               # bytes
-    # Detectar la codificación del archivo
-    result = chardet.detect(content)
-    # Obtener la codificación
-    encoding = result['encoding']
+from pandas.api.types import union_categoricals
+from config import ENCODING_BANCO, BYTES_MUESTRA_ENCODING, MAX_ENCODINGS_DETECTADOS, TIPOS_EDO_CTA
+
+class ErrorEdoCta(ValueError):
+    """Error en el contenido de un estado de cuenta que impide procesarlo (p. ej. formato no reconocido)."""
+
+class AvisoEdoCta(UserWarning):
+    """Aviso sobre el contenido de un estado de cuenta que no impide procesarlo."""
+
+def avisar(mensaje: str):
+    """Emite un aviso para el usuario; `cves.asign_cve_resultado` los recolecta y la app o la CLI los muestran."""
+    warnings.warn(mensaje, AvisoEdoCta, stacklevel=2)
+
+# tamaño de los bloques que se le pasan al detector de codificación
+BLOQUE_DETECCION = 64 * 1024
+# codificaciones ya detectadas por (banco, firma del archivo), de la menos a la más recientemente usada
+_encodings_detectados = OrderedDict()
+
+def firma_archivo(uploaded_file) -> str:
+    """
+    Firma para reconocer un archivo ya visto: tamaño y hash del contenido completo, leído por bloques.
+    (Dos archivos del mismo tamaño que solo difieren a la mitad pueden tener distinta codificación.)
+    """
+    uploaded_file.seek(0)
+    h = hashlib.sha1()
+    tamano = 0
+    while bloque := uploaded_file.read(BLOQUE_DETECCION):
+        h.update(bloque)
+        tamano += len(bloque)
+    return f"{tamano}-{h.hexdigest()}"
+
+def detectar_encoding(uploaded_file, tamano_muestra=BYTES_MUESTRA_ENCODING):
+    """
+    Detecta la codificación con chardet leyendo el archivo por bloques desde la posición actual.
+    Se detiene en cuanto el detector está seguro o al leer `tamano_muestra` bytes (None = archivo completo).
+    """
+    detector = UniversalDetector()
+    leidos = 0
+    while tamano_muestra is None or leidos < tamano_muestra:
+        n = BLOQUE_DETECCION if tamano_muestra is None else min(BLOQUE_DETECCION, tamano_muestra - leidos)
+        bloque = uploaded_file.read(n)
+        if not bloque:
+            break
+        detector.feed(bloque)
+        leidos += len(bloque)
+        if detector.done:
+            break
+    detector.close()
+    return detector.result['encoding']
+
+def get_encoding(uploaded_file, bank=None, tamano_muestra=BYTES_MUESTRA_ENCODING):
+    """
+    Codificación del archivo: la conocida del banco (config.ENCODING_BANCO) o la detectada
+    con una muestra de los primeros `tamano_muestra` bytes (None = archivo completo).
+    La detección se guarda por (banco, firma del archivo), de modo que volver a cargar el mismo archivo no la repite;
+    una detección con el archivo completo reemplaza a la de la muestra.
+    Se recuerdan como máximo config.MAX_ENCODINGS_DETECTADOS archivos.
+    """
+    if bank in ENCODING_BANCO:
+        return ENCODING_BANCO[bank]
+    llave = (bank, firma_archivo(uploaded_file))
+    if tamano_muestra is not None and llave in _encodings_detectados:
+        _encodings_detectados.move_to_end(llave)
+        return _encodings_detectados[llave]
+    uploaded_file.seek(0)
+    encoding = detectar_encoding(uploaded_file, tamano_muestra)
+    _encodings_detectados[llave] = encoding
+    _encodings_detectados.move_to_end(llave)
+    while len(_encodings_detectados) > MAX_ENCODINGS_DETECTADOS:
+        _encodings_detectados.popitem(last=False)
     return encoding
 
-def txt_to_df(uploaded_file, default_encoding=None)->pd.DataFrame:
-    content = uploaded_file.read()               # bytes
-    if default_encoding is not None:
-        encoding = default_encoding
-    else:
-        encoding = chardet.detect(content)['encoding']
-    if encoding is None:
-        print("No se pudo detectar la codificación del archivo.")
-        encoding = "latin-1"
-    text = content.decode(encoding)              # str
-    data = text.splitlines()                    # lista de líneas
-
-    data = [i.split('\t') for i in data]
-    # eliminar el \n del final de cada linea
-    data = [[i.replace('\n','') for i in j] for j in data]
-    # pasar a dataframe
-    df = pd.DataFrame(data, columns = data[0])
-    # eliminar la primera fila
-    df = df.drop(0)
-    df = df.reset_index(drop=True)
-
-    return df
\ No newline at end of file
+def leer_csv(uploaded_file, bank=None, **kwargs) -> pd.DataFrame:
+    """
+    Lee un csv con la codificación de `get_encoding`.
+    Si la muestra no bastó y el archivo no se puede decodificar, se detecta de nuevo con el archivo completo.
+    """
+    encoding = get_encoding(uploaded_file, bank)
+    uploaded_file.seek(0)  # reiniciar el puntero del archivo
+    try:
+        return pd.read_csv(uploaded_file, encoding=encoding, **kwargs)
+    except UnicodeDecodeError:
+        encoding = get_encoding(uploaded_file, bank, tamano_muestra=None)
+        uploaded_file.seek(0)
+        return pd.read_csv(uploaded_file, encoding=encoding, **kwargs)
+
+def leer_csv_por_bloques(uploaded_file, chunksize: int, bank=None, **kwargs):
+    """
+    Igual que `leer_csv` pero entrega el csv en bloques de `chunksize` filas.
+    Si un bloque no se puede decodificar, se detecta la codificación con el archivo completo,
+    se vuelve a leer desde el inicio y se descartan los registros que ya se habían entregado
+    (se cuentan registros y no líneas, porque un campo entre comillas puede tener saltos de línea).
+    """
+    encoding = get_encoding(uploaded_file, bank)
+    leidas = 0
+    try:
+        uploaded_file.seek(0)  # reiniciar el puntero del archivo
+        for df in pd.read_csv(uploaded_file, encoding=encoding, chunksize=chunksize, **kwargs):
+            leidas += len(df)
+            yield df
+    except UnicodeDecodeError:
+        encoding = get_encoding(uploaded_file, bank, tamano_muestra=None)
+        uploaded_file.seek(0)
+        for df in pd.read_csv(uploaded_file, encoding=encoding, chunksize=chunksize, **kwargs):
+            if leidas >= len(df):
+                leidas -= len(df)
+                continue
+            yield df.iloc[leidas:]
+            leidas = 0
+
+# meses abreviados en español (p. ej. "22/jun./2026" en Banorte)
+MESES_ES = {
+    'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12
+}
+PATRON_FECHA_MES_ES = re.compile(r'(\d{1,2})/([a-z]{3})\.?/(\d{4})', re.IGNORECASE)
+
+def parsear_fechas(fechas: pd.Series, formato: str, normalizar=None, meses_es: bool = False) -> pd.Series:
+    """
+    Convierte una columna de fechas en texto a datetime con `formato`, interpretando una sola vez cada texto distinto
+    (un estado de cuenta tiene pocas fechas distintas).
+    `normalizar` recibe los textos distintos (Series) y regresa su versión a interpretar (p. ej. quitar comillas).
+    Con meses_es, los textos que no cumplen el formato se intentan como "día/mes abreviado en español/año".
+    Lanza ValueError con la primera fecha que no se pudo interpretar.
+    """
+    codigos, unicas = pd.factorize(fechas, use_na_sentinel=False)
+    textos = pd.Series(unicas, dtype=object).astype(str)
+    if normalizar is not None:
+        textos = normalizar(textos)
+    convertidas = pd.to_datetime(textos, format=formato, errors="coerce")
+    fallidas = convertidas.isna()
+    if meses_es and fallidas.any():
+        partes = textos[fallidas].str.extract(PATRON_FECHA_MES_ES)
+        mes = partes[1].str.lower().map(MESES_ES)
+        validas = mes.index[mes.notna()]
+        if len(validas):
+            # solo se arman los textos de las fechas distintas que fallaron
+            texto_mes = [f"{int(dia):02d}/{int(num):02d}/{anio}" for dia, num, anio in zip(partes.loc[validas, 0], mes[validas], partes.loc[validas, 2])]
+            convertidas[validas] = pd.to_datetime(pd.Series(texto_mes, index=validas), format="%d/%m/%Y", errors="coerce")
+            fallidas = convertidas.isna()
+    if fallidas.any():
+        raise ValueError(f"No se puede parsear la fecha: {textos[fallidas].iloc[0]}")
+    return pd.Series(convertidas.to_numpy()[codigos], index=fechas.index)
+
+def asignar_pendientes(cve: pd.Series, pendientes: pd.Series, valores: pd.Series, resueltas=None) -> pd.Series:
+    """
+    Asigna a `cve` los valores de una regla evaluada sobre las filas pendientes
+    y devuelve la máscara de filas que siguen sin clave.
+    Por defecto se resuelven las filas donde la regla produjo un valor; con `resueltas`
+    se indica explícitamente qué filas quedan resueltas aunque su valor sea nulo.
+    """
+    if resueltas is None:
+        resueltas = valores.index[valores.notna()]
+    cve.loc[resueltas] = valores.loc[resueltas]
+    pendientes.loc[resueltas] = False
+    return pendientes
+
+def tipar_edo_cta(edo_cta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte las columnas del estado de cuenta que ya existan a su tipo de config.TIPOS_EDO_CTA.
+    El texto se pasa antes por str, igual que en la limpieza de columnas (un nulo queda como "nan");
+    los importes que no son numéricos (p. ej. el SALDO "#" de PNC) quedan nulos.
+    """
+    tipos = {}
+    for col, tipo in TIPOS_EDO_CTA.items():
+        if col not in edo_cta.columns or edo_cta[col].dtype == tipo:
+            continue
+        if tipo == 'string[pyarrow]':
+            tipos[col] = edo_cta[col].astype(str).astype(tipo)
+        elif tipo in ('float64', 'Float64'):
+            tipos[col] = pd.to_numeric(edo_cta[col], errors="coerce").astype(tipo)
+        else:
+            tipos[col] = edo_cta[col].astype(tipo)
+    return edo_cta.assign(**tipos) if tipos else edo_cta
+
+def concatenar_edo_cta(dfs: list) -> pd.DataFrame:
+    """
+    `pd.concat` de estados de cuenta ya tipados que conserva las categorías: pd.concat convierte a object
+    las columnas categóricas cuyas categorías no son idénticas, así que antes se les asigna a todas la unión.
+    """
+    dfs = list(dfs)
+    if len(dfs) > 1:
+        columnas = [col for col in dfs[0].columns
+                    if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in dfs)]
+        for col in columnas:
+            categorias = union_categoricals([df[col] for df in dfs]).categories
+            dfs = [df.assign(**{col: df[col].cat.set_categories(categorias)}) for df in dfs]
+    return pd.concat(dfs, ignore_index=True)
+
+def _texto_fijo(serie: pd.Series) -> pd.Series:
+    # una columna de números (p. ej. un folio) se lee como entero o como flotante según traiga nulos en ese bloque;
+    # se escribe igual en ambos casos ("123", no "123.0") y los nulos quedan vacíos
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.astype("float64")
+        return numeros.map("{:.15g}".format).where(numeros.notna(), "")
+    return serie.fillna("").astype(str)
+
+def _centavos(serie: pd.Series) -> pd.Series:
+    # + 0.0 convierte -0.0 en 0.0, que tienen distinta huella
+    return serie.astype("float64").round(2) + 0.0
+
+def campos_huella(fechas: pd.Series, importes: pd.Series, saldos: pd.Series, textos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Campos con que se identifica cada movimiento leído en el procesamiento incremental (incremental.py), con tipos fijos
+    para que la huella no dependa del tipo que pandas infiere en cada bloque del archivo: fecha como datetime64,
+    importe (con signo) y saldo como float64 redondeados a centavos, y las columnas de texto unidas en un solo str.
+    `saldos` puede ser None si el banco no trae saldo.
+    """
+    texto = pd.Series("", index=fechas.index)
+    for i, col in enumerate(textos.columns):
+        texto = texto + ("\x1f" if i else "") + _texto_fijo(textos[col])
+    return pd.DataFrame({
+        "FECHA": fechas.astype("datetime64[ns]"),
+        "IMPORTE": _centavos(importes),
+        "SALDO": _centavos(saldos) if saldos is not None else float("nan"),
+        "DESCRIPCIÓN": texto.astype(object),
+    })
@@ -0,0 +1,111 @@
+"""
+Validación del resultado de asign_cve (de uno o varios estados de cuenta unidos), por cuenta y sin recorrer fila por fila:
+
+- continuidad del saldo: el saldo de cada movimiento debe ser el saldo del movimiento anterior más el abono menos el cargo.
+  Los estados de cuenta pueden venir del más antiguo al más reciente o al revés; por cada cuenta se revisan los
+  dos sentidos y se usa el que tiene menos rupturas. Un movimiento sin saldo (p. ej. un saldo vacío de Banamex)
+  no se puede revisar: el siguiente movimiento con saldo se compara contra el último saldo conocido más el neto de
+  los movimientos intermedios. La cuenta queda como no verificada si tiene menos de dos saldos (PNC no trae saldo)
+  o si es de un banco que consolida movimientos y le faltan saldos (los movimientos consolidados de HSBC
+  no tienen uno propio ni están en su lugar dentro del estado de cuenta).
+- movimientos duplicados (filas idénticas, p. ej. por subir dos estados de cuenta que se traslapan).
+- movimientos con CARGO y ABONO en 0.
+
+    reporte = validar_edo_cta(df)
+    reporte["resumen"], reporte["rupturas"], reporte["duplicados"], reporte["sin_importe"]
+
+En los DataFrames de detalle, "FILA" es la posición del movimiento en `df` (df.iloc[FILA]).
+"""
+import numpy as np
+import pandas as pd
+from config import TOLERANCIA_SALDO, MODULOS_BANCO
+from cves import cargar_banco
+
+def _diferencias(saldo: np.ndarray, neto: np.ndarray, grupo: np.ndarray, paso: int) -> np.ndarray:
+    """
+    Saldo menos (saldo de la fila con saldo vecina + neto de los movimientos de por medio) en un sentido
+    (paso 1: la anterior, -1: la siguiente), con las filas de cada cuenta juntas.
+    NaN en las filas sin saldo y en las que no tienen una vecina con saldo de la misma cuenta.
+    """
+    # neto de las filas a..b-1 = acumulado[b] - acumulado[a]
+    acumulado = np.concatenate([[0.0], np.cumsum(neto)])
+    con_saldo = np.flatnonzero(~np.isnan(saldo))
+    if paso == 1:
+        actual, vecina = con_saldo[1:], con_saldo[:-1]
+        # movimientos después de la vecina y hasta la fila actual
+        entre = acumulado[actual + 1] - acumulado[vecina + 1]
+    else:
+        actual, vecina = con_saldo[:-1], con_saldo[1:]
+        # movimientos desde la fila actual y hasta antes de la vecina
+        entre = acumulado[vecina] - acumulado[actual]
+    mismo = grupo[actual] == grupo[vecina]
+    diferencia = np.full(len(saldo), np.nan)
+    diferencia[actual[mismo]] = (saldo[actual] - saldo[vecina] - entre)[mismo]
+    return diferencia
+
+def _consolida(banco: str) -> bool:
+    """True si el banco agrupa movimientos al procesarlo (ver cves.cargar_banco)."""
+    return banco in MODULOS_BANCO and cargar_banco(banco)["consolidar"] is not None
+
+def validar_edo_cta(df: pd.DataFrame, tolerancia: float = TOLERANCIA_SALDO) -> dict:
+    """
+    Regresa un diccionario de DataFrames: "resumen" (una fila por banco y cuenta con el número de movimientos,
+    si se verificó el saldo, cuántos movimientos no tienen saldo, el orden detectado y el número de rupturas,
+    duplicados y movimientos sin importe),
+    "rupturas" (movimientos cuyo saldo no cuadra, con la diferencia), "duplicados" (las repeticiones de un movimiento
+    que ya apareció antes) y "sin_importe".
+    Una diferencia de saldo mayor a `tolerancia` es una ruptura.
+    """
+    cols_detalle = ["BANCO", "CUENTA", "FECHA", "DETALLE", "CARGO", "ABONO", "SALDO", "CLAVE"]
+    cuentas = df.groupby(["BANCO", "CUENTA"], observed=True, sort=False)
+    grupo = cuentas.ngroup().to_numpy()
+    n_grupos = cuentas.ngroups
+    saldo = df["SALDO"].to_numpy(dtype=float, na_value=np.nan)
+    cargo = df["CARGO"].to_numpy(dtype=float, na_value=np.nan)
+    abono = df["ABONO"].to_numpy(dtype=float, na_value=np.nan)
+    neto = np.nan_to_num(abono) - np.nan_to_num(cargo)
+
+    # continuidad en los dos sentidos, con las filas de cada cuenta juntas y en su orden;
+    # por cuenta se elige el sentido que tiene menos rupturas
+    orden = np.argsort(grupo, kind="stable")
+    ascendente, descendente = np.empty(len(df)), np.empty(len(df))
+    ascendente[orden] = _diferencias(saldo[orden], neto[orden], grupo[orden], 1)
+    descendente[orden] = _diferencias(saldo[orden], neto[orden], grupo[orden], -1)
+    rupturas_asc = np.bincount(grupo, weights=np.abs(ascendente) > tolerancia, minlength=n_grupos)
+    rupturas_desc = np.bincount(grupo, weights=np.abs(descendente) > tolerancia, minlength=n_grupos)
+    filas = np.bincount(grupo, minlength=n_grupos)
+    con_saldo = np.bincount(grupo, weights=~np.isnan(saldo), minlength=n_grupos)
+    claves = cuentas.size().reset_index(name="MOVIMIENTOS")
+    consolida = np.array([_consolida(str(banco)) for banco in claves["BANCO"]], dtype=bool)
+    verificada = (con_saldo > 1) & ~(consolida & (con_saldo < filas))
+    es_descendente = rupturas_desc < rupturas_asc
+    diferencia = np.where(es_descendente[grupo], descendente, ascendente)
+    es_ruptura = verificada[grupo] & (np.abs(diferencia) > tolerancia)
+
+    es_duplicado = df.duplicated().to_numpy()
+    es_sin_importe = (np.nan_to_num(cargo) == 0) & (np.nan_to_num(abono) == 0)
+
+    resumen = claves.assign(
+        SALDO_VERIFICADO=verificada,
+        SIN_SALDO=(filas - con_saldo).astype(int),
+        ORDEN=np.where(~verificada, None, np.where(es_descendente, "descendente", "ascendente")),
+        RUPTURAS_SALDO=np.bincount(grupo, weights=es_ruptura, minlength=n_grupos).astype(int),
+        DUPLICADOS=np.bincount(grupo, weights=es_duplicado, minlength=n_grupos).astype(int),
+        SIN_IMPORTE=np.bincount(grupo, weights=es_sin_importe, minlength=n_grupos).astype(int),
+    )
+    # las columnas de banco y cuenta como texto para mostrar el resumen junto con otros
+    resumen[["BANCO", "CUENTA"]] = resumen[["BANCO", "CUENTA"]].astype(str)
+
+    def detalle(mascara: np.ndarray) -> pd.DataFrame:
+        return df.loc[mascara, cols_detalle].assign(FILA=np.flatnonzero(mascara)).reset_index(drop=True)
+
+    return {
+        "resumen": resumen,
+        "rupturas": detalle(es_ruptura).assign(DIFERENCIA=diferencia[es_ruptura]),
+        "duplicados": detalle(es_duplicado),
+        "sin_importe": detalle(es_sin_importe),
+    }
+
+def hay_problemas(reporte: dict) -> bool:
+    """True si el reporte tiene rupturas de saldo, duplicados o movimientos sin importe."""
+    return any(len(reporte[parte]) for parte in ["rupturas", "duplicados", "sin_importe"])